@@ -1,18 +1,50 @@
 # source = teledyneT3PS("10.9.0.51", port=1026)
 # from teledyneT3PS import teledyneT3PS
-from keysightE36312A import keysightE36312A
+from models import TimingProfile
+from timing import SettleTracker
 import time
 
+
+class AmpStateTracker:
+    """
+    Remembers when the amp output was last verified off.
+
+    The rail only comes back on through turn_on_amp, so an off verification is
+    trusted for ``freshness`` seconds; anything that sees or causes the output
+    being on must call invalidate().
+    """
+
+    def __init__(self, freshness: float):
+        self.freshness = freshness
+        self._verified_off_at: float | None = None
+
+    def mark_off(self):
+        self._verified_off_at = time.monotonic()
+
+    def invalidate(self):
+        self._verified_off_at = None
+
+    def known_off(self) -> bool:
+        verified_at = self._verified_off_at
+        if verified_at is None:
+            return False
+        return time.monotonic() - verified_at <= self.freshness
+
+
 class AmpProtector():
     """
     Class for controlling the Keysight E36312A power supply
     Can use either direct connection or client connection via TCP server
     """
 
-    def __init__(self, disabled: bool = False, on: bool = False, channel: int = 3, use_client: bool = True):
+    def __init__(self, disabled: bool = False, on: bool = False, channel: int = 3, use_client: bool = True, timing: TimingProfile | None = None, connect: bool = True):
         self.disabled = disabled
         self.channel = channel
         self.use_client = use_client
+        self.timing = timing if timing is not None else TimingProfile()
+        # observed OUTP OFF -> 0 V times, used by the adaptive timing mode
+        self.off_settle = SettleTracker()
+        self.state = AmpStateTracker(self.timing.amp_off_freshness)
         
         if not self.disabled:
             if self.use_client:
@@ -21,30 +53,85 @@ class AmpProtector():
                 self.source = ClientKeysightE36312A()
             else:
                 # Use direct VISA connection
+                from keysightE36312A import keysightE36312A
                 self.source = keysightE36312A("10.9.0.17")
-            
-            self.source.connect()
+
+            if connect:
+                self.source.connect()
 
         self.on: bool = on # does not turn on amp, but identifies if default state is on or off
 
 
-    def turn_off_amp(self):
+    def connect(self) -> bool:
+        """Connect to the supply, for protectors built with ``connect=False``."""
+        if self.disabled:
+            return True
+        return self.source.connect() is not False
+
+    def turn_off_amp(self, force: bool = False):
+        """
+        Turn the amp output off and verify it reads off and discharged.
+
+        Skipped when the output was verified off within the freshness window,
+        unless ``force`` is set.
+        """
         if self.disabled:
             return
+        if not force and self.state.known_off():
+            return
+        self.state.invalidate()
         # self.source.setVoltage(1, 0.0)
         # self.source.disableChannel(1)
+        timing = self.timing
+        started = time.monotonic()
         self.source.output_off(self.channel)
-        time.sleep(0.4)
+        if timing.adaptive:
+            time.sleep(self.off_settle.suggest(timing.amp_off_settle))
+        else:
+            time.sleep(timing.amp_off_settle)
+
+        # poll until the output reports off and has discharged, rather than
+        # trusting a fixed sleep; give up after amp_off_timeout
+        deadline = started + timing.amp_off_timeout
+        while True:
+            output_off, voltage = self._read_output()
+            discharged = output_off and voltage <= 0.005
+            if discharged or time.monotonic() >= deadline:
+                break
+            time.sleep(timing.amp_poll_interval)
+
+        assert output_off, "Amp did not turn off"
+        assert discharged, "Amp did not turn off completely"
+        self.off_settle.observe(time.monotonic() - started)
+        self.state.mark_off()
 
-        assert self.source.get_on_off(self.channel) == "0", "Amp did not turn off"
-        assert self.source.getVoltage(self.channel) <= 0.005, "Amp did not turn off completely"
 
+    def _read_output(self) -> tuple[bool, float]:
+        """Whether the output reads off, and its voltage, in one pipelined round trip
+        when going through the client connection."""
+        if hasattr(self.source, "pipeline"):
+            on_off, voltage = self.source.pipeline([
+                ("get_on_off", (self.channel,), {}),
+                ("getVoltage", (self.channel,), {}),
+            ])
+            return on_off == "0", float(voltage) if voltage is not None else 0.0
+        return self.source.get_on_off(self.channel) == "0", self.source.getVoltage(self.channel)
+
+    def estimated_off_seconds(self) -> float:
+        """Expected wall time of turn_off_amp."""
+        if self.disabled or self.state.known_off():
+            return 0.0
+        if self.timing.adaptive and self.off_settle.estimate is not None:
+            return self.off_settle.estimate
+        return self.timing.amp_off_settle
 
     def turn_on_amp(self):
         if self.disabled:
             return
         
         # disabled for now, for safety
+        # re-enable together with self.state.invalidate(), or the amp tracker
+        # would keep skipping turn_off_amp while the output is on
         # self.source.output_on(self.channel)
         time.sleep(0.2)
 
@@ -62,9 +149,12 @@ class AmpProtector():
         if self.disabled:
             return False
         try:
-            return self.source.get_on_off(self.channel) == "1"
+            on = self.source.get_on_off(self.channel) == "1"
         except:
             return False
+        if on:
+            self.state.invalidate()
+        return on
 
     def get_voltage(self):
         """Get current voltage reading"""
@@ -4,19 +4,23 @@ Provides the exact same interface as keysightE36312A but sends commands over TCP
 Uses persistent connection for better performance
 """
 
-import socket
-import json
+import logging
 import time
-import threading
 import sys
 
+from instrument_client import InstrumentClient
 
-class ClientKeysightE36312A:
+logger = logging.getLogger(__name__)
+
+
+class ClientKeysightE36312A(InstrumentClient):
     """
     Client proxy for keysightE36312A that communicates with a TCP server
     Provides the same interface as the original class
     Uses persistent connection for better performance
     """
+
+    label = "Keysight"
     
     def __init__(self, ipAddress: str = "", server_host: str = "localhost", 
                  server_port: int = 8888, timeout: float = 5.0, **kwargs):
@@ -27,114 +31,14 @@ class ClientKeysightE36312A:
         :param timeout: Timeout for socket operations
         :param kwargs: Additional arguments (ignored, kept for compatibility)
         """
-        self.server_host = server_host
-        self.server_port = server_port
-        self.timeout = timeout
+        super().__init__(server_host, server_port, timeout)
         self.high_level = 0  # Keep for compatibility
-        self._connected = False
-        self._socket = None
-        self._lock = threading.Lock()  # Thread safety for socket operations
-        
-    def connect(self):
-        """
-        Connect to the server and maintain persistent connection
-        """
-        with self._lock:
-            if self._connected:
-                return True
-                
-            try:
-                self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self._socket.settimeout(self.timeout)
-                self._socket.connect((self.server_host, self.server_port))
-                
-                self._connected = True
-                print(f"Connected to Keysight server at {self.server_host}:{self.server_port}")
-                return True
-                
-            except Exception as e:
-                print(f"Failed to connect to Keysight server: {e}")
-                self._connected = False
-                if self._socket:
-                    try:
-                        self._socket.close()
-                    except:
-                        pass
-                    self._socket = None
-                return False
-            
-    def disconnect(self):
-        """Close the persistent connection"""
-        with self._lock:
-            self._connected = False
-            if self._socket:
-                try:
-                    self._socket.close()
-                except:
-                    pass
-                self._socket = None
-            return True
-            
-    def _send_request(self, method: str, *args, **kwargs):
-        """Send a request to the server using persistent connection"""
-        request = {
-            'method': method,
-            'args': args,
-            'kwargs': kwargs
-        }
+
+    def _unavailable(self, error: Exception):
+        # the amp cannot be verified off without the server
+        logger.critical("Amp supply unavailable (%s). Killing, for safety", error)
+        sys.exit(1)
         
-        with self._lock:
-            if not self._connected or not self._socket:
-                print("Not connected to server. Killing, for safety")
-                # # because if the program is not able to 
-                sys.exit(1)
-                raise RuntimeError("Not connected to server. Call connect() first.")
-                
-            try:
-                # Send request
-                request_json = json.dumps(request).encode('utf-8')
-                self._socket.send(request_json)
-                
-                # Receive response
-                response_data = self._socket.recv(4096)
-                
-                # Parse response
-                response = json.loads(response_data.decode('utf-8'))
-                
-                if 'error' in response:
-                    raise RuntimeError(f"Server error: {response['error']}")
-                    
-                return response.get('result')
-                
-            except socket.timeout:
-                # Connection may be broken, mark as disconnected
-                self._connected = False
-                raise TimeoutError(f"Request to server timed out after {self.timeout} seconds")
-            except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError) as e:
-                # Connection was broken, mark as disconnected
-                self._connected = False
-                raise RuntimeError(f"Connection to server lost: {e}")
-            except json.JSONDecodeError:
-                sys.exit(1)
-                raise RuntimeError("Invalid response from server")
-                
-            except Exception as e:
-                # For other errors, try to reconnect next time
-                self._connected = False
-                raise RuntimeError(f"Communication error: {e}")
-                
-    def _send_request_with_retry(self, method: str, *args, **kwargs):
-        """Send request with automatic reconnection on failure"""
-        try:
-            return self._send_request(method, *args, **kwargs)
-        except (RuntimeError, TimeoutError) as e:
-            # If connection failed, try to reconnect once
-            if "Connection" in str(e) or "timeout" in str(e).lower():
-                print("Connection lost, attempting to reconnect...")
-                if self.connect():
-                    return self._send_request(method, *args, **kwargs)
-            raise
-            
     def init(self):
         """Initialize the instrument"""
         return self._send_request_with_retry('init')
@@ -165,9 +69,6 @@ class ClientKeysightE36312A:
         result = self._send_request_with_retry('getCurrent', channel)
         return float(result) if result is not None else 0.0
         
-    def __del__(self):
-        """Cleanup on destruction"""
-        self.disconnect()
 
 
 # For backwards compatibility, create an alias
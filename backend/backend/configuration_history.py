@@ -0,0 +1,174 @@
+"""
+Queries over the ConfigurationSnapshot table: content-addressed stashing,
+cursor-paginated listing, detail lookup and retention.
+
+Each distinct title-and-labels combination is stored once, keyed by its
+content hash; stashing it again only moves it to the top of the history and
+adds a row to the ConfigurationStash timeline.
+
+Pages are ordered newest first by (created_at, id). A cursor names the last
+row of the previous page, so each page is one range scan of the created_at
+index (SQLite appends the rowid to every index) no matter how many stashes an
+instrument has collected. Summary pages select only id, title and timestamp.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlmodel import Session, and_, delete, func, or_, select
+
+from db import ConfigurationSnapshot, ConfigurationStash, configuration_hash
+from models import ButtonLabelsBase, HistoryRetention
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _utc(created_at: datetime) -> datetime:
+    # SQLite may return a timezone-naive value even though we save UTC.
+    if created_at.tzinfo is None:
+        return created_at.replace(tzinfo=timezone.utc)
+    return created_at
+
+
+def snapshot_summary(snapshot_id: int, title_label: str, created_at: datetime) -> dict[str, Any]:
+    return {
+        "id": snapshot_id,
+        "title_label": title_label,
+        "created_at": _utc(created_at).isoformat(),
+    }
+
+
+def snapshot_labels(snapshot: ConfigurationSnapshot) -> dict[str, Any]:
+    # model_validate would hand back the snapshot itself, a ButtonLabelsBase
+    # subclass, so pick the label fields explicitly
+    return snapshot.model_dump(mode="json", include=set(ButtonLabelsBase.model_fields))
+
+
+def snapshot_detail(snapshot: ConfigurationSnapshot) -> dict[str, Any]:
+    return {
+        **snapshot_summary(snapshot.id, snapshot.title_label, snapshot.created_at),
+        "labels": snapshot_labels(snapshot),
+    }
+
+
+def record_stash(session: Session, title_label: str, labels: dict[str, Any]) -> ConfigurationSnapshot:
+    """Record a stash of this configuration, reusing its snapshot if it exists.
+    The caller commits."""
+    digest = configuration_hash(title_label, labels)
+    now = datetime.now(timezone.utc)
+    snapshot = session.exec(
+        select(ConfigurationSnapshot).where(ConfigurationSnapshot.content_hash == digest)
+    ).first()
+    if snapshot is None:
+        snapshot = ConfigurationSnapshot(
+            title_label=title_label, content_hash=digest, created_at=now, **labels
+        )
+    else:
+        snapshot.created_at = now
+    session.add(snapshot)
+    session.flush()
+    session.add(ConfigurationStash(snapshot_id=snapshot.id, stashed_at=now))
+    return snapshot
+
+
+def encode_cursor(created_at: datetime, snapshot_id: int) -> str:
+    return f"{_utc(created_at).isoformat()}|{snapshot_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Raises ValueError for a cursor this module did not produce."""
+    created_at, _, snapshot_id = cursor.rpartition("|")
+    return _utc(datetime.fromisoformat(created_at)), int(snapshot_id)
+
+
+def history_page(
+    session: Session,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    summary: bool = True,
+) -> dict[str, Any]:
+    """Up to ``limit`` snapshots older than ``cursor``, newest first, and the
+    cursor of the next page (None on the last page)."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    table = ConfigurationSnapshot
+    columns = (
+        (table.id, table.title_label, table.created_at) if summary else (table,)
+    )
+    query = select(*columns).order_by(table.created_at.desc(), table.id.desc())
+    if cursor is not None:
+        created_at, snapshot_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                table.created_at < created_at,
+                and_(table.created_at == created_at, table.id < snapshot_id),
+            )
+        )
+    # One extra row tells whether another page follows
+    rows = session.exec(query.limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if summary:
+        items = [snapshot_summary(*row) for row in rows]
+        last = (rows[-1][2], rows[-1][0]) if rows else None
+    else:
+        items = [snapshot_detail(row) for row in rows]
+        last = (rows[-1].created_at, rows[-1].id) if rows else None
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(*last) if more and last else None,
+    }
+
+
+def apply_retention(session: Session, policy: HistoryRetention) -> int:
+    """Delete snapshots outside ``policy``; returns how many were removed."""
+    table = ConfigurationSnapshot
+    removed = 0
+    if policy.thin_after_days is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=policy.thin_after_days)
+        # Restashing refreshes created_at, so ids are not in time order: pick
+        # each day's survivor by time, with the id only breaking ties
+        ranked = (
+            select(
+                table.id,
+                func.row_number()
+                .over(
+                    partition_by=func.date(table.created_at),
+                    order_by=(table.created_at.desc(), table.id.desc()),
+                )
+                .label("rank"),
+            )
+            .where(table.created_at < cutoff)
+            .subquery()
+        )
+        newest_per_day = select(ranked.c.id).where(ranked.c.rank == 1)
+        removed += session.execute(
+            delete(table).where(
+                table.created_at < cutoff, table.id.not_in(newest_per_day)
+            )
+        ).rowcount
+    if policy.keep_last is not None:
+        newest = (
+            select(table.id)
+            .order_by(table.created_at.desc(), table.id.desc())
+            .limit(max(policy.keep_last, 0))
+        )
+        removed += session.execute(
+            delete(table).where(table.id.not_in(newest))
+        ).rowcount
+        # The timeline of stashes is bounded the same way
+        recent_stashes = (
+            select(ConfigurationStash.id)
+            .order_by(ConfigurationStash.stashed_at.desc(), ConfigurationStash.id.desc())
+            .limit(max(policy.keep_last, 0))
+        )
+        session.execute(
+            delete(ConfigurationStash).where(ConfigurationStash.id.not_in(recent_stashes))
+        )
+    if removed:
+        session.execute(
+            delete(ConfigurationStash).where(
+                ConfigurationStash.snapshot_id.not_in(select(table.id))
+            )
+        )
+    return removed
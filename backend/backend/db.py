@@ -1,11 +1,19 @@
 from datetime import datetime, timezone
-from typing import Optional
+import hashlib
+from typing import Any, Optional
 
 from sqlmodel import Field, Session, SQLModel, create_engine, select
 from pydantic import BaseModel
-from models import ButtonLabelsBase, Tree, SettingsBase, SwitchState, PulseGenInfo
+from models import (
+    ButtonLabelsBase,
+    PulseGenInfo,
+    RelayWearBase,
+    SettingsBase,
+    SwitchState,
+    Tree,
+)
 import json
-from sqlalchemy import text
+from sqlalchemy import event, text
 
 # Define a base Pydantic model for the labels (used for request/response structure)
 
@@ -16,13 +24,36 @@ class ButtonLabels(SQLModel, ButtonLabelsBase, table=True):
 
 
 class ConfigurationSnapshot(SQLModel, ButtonLabelsBase, table=True):
-    """A named, append-only copy of the user-visible configuration."""
+    """
+    A named copy of the user-visible configuration, stored once per distinct
+    content. ``created_at`` is when it was last stashed; every stash is kept
+    in ConfigurationStash.
+    """
 
     id: Optional[int] = Field(default=None, primary_key=True)
     title_label: str = "Title Here"
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc), index=True
     )
+    content_hash: Optional[str] = Field(default=None, unique=True, index=True)
+
+
+class ConfigurationStash(SQLModel, table=True):
+    """One stash of a configuration: the timeline behind ConfigurationSnapshot."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    snapshot_id: int = Field(foreign_key="configurationsnapshot.id", index=True)
+    stashed_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), index=True
+    )
+
+
+def configuration_hash(title_label: str, labels: dict[str, Any]) -> str:
+    """Content address of a title plus button labels."""
+    content = {"title_label": title_label, **ButtonLabelsBase.model_validate(labels).model_dump()}
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
 
 
 class InitializationResponse(BaseModel):
@@ -67,12 +98,38 @@ class TreeState(SQLModel, table=True):
     ))
 
 
+class RelayWear(SQLModel, table=True):
+    """Checkpoint of the relay actuation counters, stored as JSON."""
+    id: Optional[int] = Field(default=1, primary_key=True)
+    wear_json: str = Field(default_factory=lambda: RelayWearBase().model_dump_json())
+
+
 sqlite_file_name = "database.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
 connect_args = {"check_same_thread": False}
 engine = create_engine(sqlite_url, connect_args=connect_args)
 
+# WAL lets readers (history listing, state load) run alongside the writer, and
+# with WAL synchronous=NORMAL only syncs at checkpoints: a power cut can lose
+# the last commits but never corrupts the database.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+
+def apply_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+event.listen(engine, "connect", apply_pragmas)
+
 
 def get_session():
     with Session(engine) as session:
@@ -91,6 +148,8 @@ def create_db_and_tables():
                 "ALTER TABLE settings ADD COLUMN title_label TEXT DEFAULT 'Title Here'"
             )
             print("Added title_label column to settings table.")
+        _migrate_snapshot_hashes(conn)
+        conn.commit()
     # Ensure the default label row exists
     with Session(engine) as session:
         # Use the DB model (ButtonLabels) here
@@ -135,3 +194,53 @@ def create_db_and_tables():
             session.add(db_tree)
             session.commit()
             print("Default tree state created.")
+
+        if session.get(RelayWear, 1) is None:
+            session.add(RelayWear(id=1))
+            session.commit()
+
+
+def _migrate_snapshot_hashes(conn):
+    """Content-address snapshots stashed before deduplication: hash them,
+    keep the newest copy of each configuration and move every stash of the
+    older copies onto it."""
+    res = conn.exec_driver_sql("PRAGMA table_info('configurationsnapshot')").fetchall()
+    if "content_hash" not in {row[1] for row in res}:
+        conn.exec_driver_sql(
+            "ALTER TABLE configurationsnapshot ADD COLUMN content_hash VARCHAR"
+        )
+    label_columns = list(ButtonLabelsBase.model_fields)
+    rows = conn.exec_driver_sql(
+        f"SELECT id, created_at, title_label, {', '.join(label_columns)} "
+        "FROM configurationsnapshot WHERE content_hash IS NULL "
+        "ORDER BY created_at DESC, id DESC"
+    ).fetchall()
+    if rows:
+        # hashes already in use, to fold legacy rows into existing snapshots
+        keepers = dict(
+            conn.exec_driver_sql(
+                "SELECT content_hash, id FROM configurationsnapshot "
+                "WHERE content_hash IS NOT NULL"
+            ).fetchall()
+        )
+        for snapshot_id, created_at, title_label, *labels in rows:
+            digest = configuration_hash(title_label, dict(zip(label_columns, labels)))
+            keeper = keepers.setdefault(digest, snapshot_id)
+            conn.exec_driver_sql(
+                "INSERT INTO configurationstash (snapshot_id, stashed_at) VALUES (?, ?)",
+                (keeper, created_at),
+            )
+            if keeper == snapshot_id:
+                conn.exec_driver_sql(
+                    "UPDATE configurationsnapshot SET content_hash = ? WHERE id = ?",
+                    (digest, snapshot_id),
+                )
+            else:
+                conn.exec_driver_sql(
+                    "DELETE FROM configurationsnapshot WHERE id = ?", (snapshot_id,)
+                )
+        print(f"Content-addressed {len(rows)} configuration snapshots.")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_configurationsnapshot_content_hash "
+        "ON configurationsnapshot (content_hash)"
+    )
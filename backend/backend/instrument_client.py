@@ -0,0 +1,291 @@
+"""
+Shared core of the instrument-server clients (client_keysight33622A,
+client_teledyneT3AFG200, client_keysightE36312A).
+
+Connections live in a small process-wide pool keyed by (host, port,
+instrument), so clients for the same instrument share one socket. Before every
+request the pooled socket is checked, without blocking, for a server-side
+close. A dead connection is reopened with exponential backoff and jitter
+before anything is sent, so a restarted server costs the next command a
+reconnect instead of a failure. A request is only retried when it provably
+never reached the server; once written, a lost connection is reported as an
+InstrumentConnectionError rather than risking a second pulse.
+"""
+
+import logging
+import random
+import socket
+import threading
+import time
+
+from instrument_protocol import (
+    InstrumentConnection,
+    InstrumentConnectionError,
+    InstrumentServerError,
+    InstrumentTimeoutError,
+    ProtocolError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with equal jitter: half the step is fixed, half random."""
+    step = min(cap, base * 2 ** attempt)
+    return step / 2 + random.uniform(0, step / 2)
+
+
+def _enable_keepalive(sock: socket.socket, idle: int = 10, interval: int = 5, count: int = 3):
+    """TCP keepalive probes, so a vanished server is noticed on an idle connection."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (
+        ("TCP_KEEPIDLE", idle),
+        ("TCP_KEEPALIVE", idle),  # macOS name for TCP_KEEPIDLE
+        ("TCP_KEEPINTVL", interval),
+        ("TCP_KEEPCNT", count),
+    ):
+        if hasattr(socket, option):
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+            except OSError:
+                pass
+
+
+class PooledConnection:
+    """One socket to the server for one instrument, plus its health counters."""
+
+    def __init__(self, key: tuple[str, int, str | None]):
+        self.key = key
+        self.lock = threading.Lock()  # serializes requests on the socket
+        self.connection: InstrumentConnection | None = None
+        self.users = 0
+        self.requests = 0
+        self.failures = 0
+        self.reconnects = 0
+        self.last_error: str | None = None
+        self.last_latency: float | None = None
+        self.connected_since: float | None = None
+
+    def open(self, timeout: float):
+        host, port, _ = self.key
+        sock = socket.create_connection((host, port), timeout=timeout)
+        sock.settimeout(timeout)
+        _enable_keepalive(sock)
+        if self.connected_since is not None:
+            self.reconnects += 1
+        self.connection = InstrumentConnection(sock)
+        self.connected_since = time.time()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def health(self) -> dict:
+        host, port, instrument = self.key
+        return {
+            "host": host,
+            "port": port,
+            "instrument": instrument,
+            "connected": self.connection is not None,
+            "pipelined": bool(self.connection and self.connection.pipelined),
+            "requests": self.requests,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            "last_latency": self.last_latency,
+            "connected_since": self.connected_since,
+        }
+
+
+_pool: dict[tuple[str, int, str | None], PooledConnection] = {}
+_pool_lock = threading.Lock()
+
+
+def _acquire(key: tuple[str, int, str | None]) -> PooledConnection:
+    with _pool_lock:
+        entry = _pool.get(key)
+        if entry is None:
+            entry = _pool[key] = PooledConnection(key)
+        entry.users += 1
+        return entry
+
+
+def _release(entry: PooledConnection):
+    with _pool_lock:
+        entry.users -= 1
+        if entry.users > 0:
+            return
+        _pool.pop(entry.key, None)
+    with entry.lock:
+        entry.close()
+
+
+def pool_health() -> list[dict]:
+    """Health counters of every pooled connection."""
+    with _pool_lock:
+        entries = list(_pool.values())
+    return [entry.health() for entry in entries]
+
+
+class InstrumentClient:
+    """
+    Base class for proxies that forward method calls to the instrument server.
+    Subclasses set ``instrument`` (the server-side routing key) and ``label``,
+    then implement each instrument method with _send_request_with_retry.
+    """
+
+    instrument: str | None = None
+    label = "instrument"
+
+    def __init__(self, server_host: str = "localhost", server_port: int = 8888,
+                 timeout: float = 5.0, max_attempts: int = 5,
+                 backoff: float = 0.05, max_backoff: float = 2.0):
+        """
+        :param server_host: Host where the instrument server is running
+        :param server_port: Port where the instrument server is listening
+        :param timeout: Timeout for socket operations
+        :param max_attempts: Connection attempts per request before giving up
+        :param backoff: First reconnect delay, doubled on every further attempt
+        :param max_backoff: Upper bound of the reconnect delay
+        """
+        self.server_host = server_host
+        self.server_port = server_port
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._entry: PooledConnection | None = None
+
+    @property
+    def _connected(self) -> bool:
+        return self._entry is not None and self._entry.connection is not None
+
+    def connect(self):
+        """
+        Connect to the server (or join the pooled connection); one attempt.
+        Returns False if the server is unreachable; requests keep retrying.
+        """
+        if self._entry is None:
+            self._entry = _acquire((self.server_host, self.server_port, self.instrument))
+        entry = self._entry
+        with entry.lock:
+            if entry.connection is not None and not entry.connection.is_stale():
+                return True
+            entry.close()
+            try:
+                entry.open(self.timeout)
+            except OSError as e:
+                entry.last_error = str(e)
+                logger.error("Failed to connect to %s server: %s", self.label, e)
+                return False
+        logger.info(
+            "Connected to %s server at %s:%s", self.label, self.server_host, self.server_port
+        )
+        return True
+
+    def disconnect(self):
+        """Leave the pooled connection; the socket closes with its last user"""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            _release(entry)
+        return True
+
+    def health(self) -> dict:
+        """Health counters of this client's pooled connection"""
+        if self._entry is None:
+            return {"connected": False}
+        return self._entry.health()
+
+    def _unavailable(self, error: Exception):
+        """Called when the server stays unreachable or answers garbage."""
+        raise error
+
+    def _request(self, method: str, *args, **kwargs) -> dict:
+        request = {'method': method, 'args': args, 'kwargs': kwargs}
+        if self.instrument is not None:
+            request['instrument'] = self.instrument
+        return request
+
+    def _send_requests(self, requests: list[dict]) -> list:
+        """Send ``requests`` on the pooled connection, reconnecting with backoff
+        while nothing has been written, and return their results in order."""
+        entry = self._entry
+        if entry is None:
+            return self._unavailable(
+                InstrumentConnectionError("Not connected to server. Call connect() first.")
+            )
+        with entry.lock:
+            replies = self._exchange(entry, requests)
+        for request, reply in zip(requests, replies):
+            if 'error' in reply:
+                raise InstrumentServerError(request['method'], reply['error'])
+        return [reply.get('result') for reply in replies]
+
+    def _exchange(self, entry: PooledConnection, requests: list[dict]) -> list[dict]:
+        last_error: Exception | None = None
+        for attempt in range(self.max_attempts):
+            if entry.connection is not None and entry.connection.is_stale():
+                entry.close()
+            if entry.connection is None:
+                if attempt:
+                    time.sleep(backoff_delay(attempt - 1, self.backoff, self.max_backoff))
+                try:
+                    entry.open(self.timeout)
+                    logger.info("Reconnected to %s server", self.label)
+                except OSError as e:
+                    last_error = e
+                    entry.last_error = str(e)
+                    continue
+            connection = entry.connection
+            started = time.perf_counter()
+            try:
+                replies = connection.pipeline(requests)
+            except socket.timeout:
+                self._failed(entry, "timeout")
+                raise InstrumentTimeoutError(
+                    f"Request to server timed out after {self.timeout} seconds"
+                )
+            except ProtocolError as e:
+                self._failed(entry, str(e))
+                return self._unavailable(e)
+            except OSError as e:
+                sent = connection.awaiting_reply
+                self._failed(entry, str(e))
+                if sent:
+                    raise InstrumentConnectionError(f"Connection to server lost: {e}")
+                last_error = e
+                continue
+            entry.requests += len(requests)
+            entry.last_latency = time.perf_counter() - started
+            return replies
+        return self._unavailable(InstrumentConnectionError(
+            f"Could not reach {self.label} server after {self.max_attempts} attempts: {last_error}"
+        ))
+
+    def _failed(self, entry: PooledConnection, error: str):
+        entry.failures += 1
+        entry.last_error = error
+        entry.close()
+
+    def _send_request(self, method: str, *args, **kwargs):
+        """Send a request to the server using the pooled connection"""
+        return self._send_requests([self._request(method, *args, **kwargs)])[0]
+
+    def _send_request_with_retry(self, method: str, *args, **kwargs):
+        """Send a request; reconnection with backoff is built into _send_requests"""
+        return self._send_request(method, *args, **kwargs)
+
+    def pipeline(self, calls: list):
+        """
+        Run several (method, args, kwargs) calls back to back and return their results in order.
+        A server that supports pipelining receives them all in one write.
+        """
+        return self._send_requests(
+            [self._request(method, *args, **kwargs) for method, args, kwargs in calls]
+        )
+
+    def __del__(self):
+        """Cleanup on destruction"""
+        if getattr(self, "_entry", None) is not None:
+            self.disconnect()
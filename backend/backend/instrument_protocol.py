@@ -0,0 +1,183 @@
+"""
+Framing for the JSON instrument protocol spoken to the socket server
+(lab_remote_terminal_control, or instrument_stand_in.py for local testing).
+
+Every request is one JSON object terminated by a newline and carries an
+``id``. Replies are read into a buffer and decoded one JSON value at a time,
+so a reply split across several recv() calls, or several replies arriving in
+one, are handled correctly instead of relying on a single recv(4096).
+
+Servers that echo the request ``id`` in their replies get requests pipelined:
+a batch is written in one go and the replies are matched back up by id.
+Older servers that ignore the id are driven one request at a time, which is
+exactly what they expect.
+"""
+
+import codecs
+import itertools
+import json
+import re
+import select
+import socket
+
+
+class InstrumentError(RuntimeError):
+    """Base class for failures talking to the instrument server."""
+
+
+class InstrumentConnectionError(InstrumentError):
+    """The server could not be reached, or the connection dropped mid-request."""
+
+
+class InstrumentTimeoutError(InstrumentConnectionError, TimeoutError):
+    """The server did not reply in time; the request may still have executed."""
+
+
+class InstrumentServerError(InstrumentError):
+    """The server received the request and reported an error running it."""
+
+    def __init__(self, method: str, message: str):
+        super().__init__(f"Server error: {message}")
+        self.method = method
+        self.message = message
+
+    @property
+    def unknown_method(self) -> bool:
+        """The server has no such method, so nothing reached the instrument.
+
+        Only the AttributeError of the method lookup itself counts. Any other
+        error, even one that names the method, may have been raised after
+        the method had already talked to the instrument.
+        """
+        pattern = rf"'\w+' object has no attribute '{re.escape(self.method)}'"
+        return re.fullmatch(pattern, self.message) is not None
+
+
+class ProtocolError(InstrumentError):
+    """The server sent something that is not a reply to an outstanding request."""
+
+
+class FrameReader:
+    """Incremental decoder for a stream of JSON values."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, data: bytes):
+        self._buffer += self._text.decode(data)
+
+    def pop(self) -> dict | None:
+        """The next complete JSON value in the buffer, or None if there is none yet."""
+        self._buffer = self._buffer.lstrip()
+        if not self._buffer:
+            return None
+        try:
+            value, end = self._decoder.raw_decode(self._buffer)
+        except json.JSONDecodeError as e:
+            # Without a newline the value may simply be incomplete; a full
+            # newline-terminated line that does not decode is garbage.
+            if "\n" not in self._buffer:
+                return None
+            raise ProtocolError(f"Invalid response from server: {e}") from e
+        self._buffer = self._buffer[end:]
+        return value
+
+
+def encode_request(request: dict) -> bytes:
+    return (json.dumps(request) + "\n").encode("utf-8")
+
+
+class InstrumentConnection:
+    """
+    One persistent socket to the instrument server.
+
+    Not thread-safe; callers serialize access (the client classes hold a lock).
+    Any exception leaves the stream in an unknown state, so the connection must
+    be discarded afterwards.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self._socket = sock
+        self._reader = FrameReader()
+        self._ids = itertools.count(1)
+        # None until the first reply shows whether the server echoes ids
+        self.pipelined: bool | None = None
+        # True between a completed write and its replies: if the connection
+        # fails then, the server may have executed the requests
+        self.awaiting_reply = False
+
+    def close(self):
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+
+    def call(self, request: dict) -> dict:
+        """Send one request and return the server's reply object."""
+        return self.pipeline([request])[0]
+
+    def pipeline(self, requests: list[dict]) -> list[dict]:
+        """Send ``requests`` and return their replies in the same order.
+
+        Against a server that echoes ids all requests go out in a single write;
+        otherwise they are sent one at a time.
+        """
+        if not self.pipelined:
+            replies = []
+            for request in requests:
+                request_id = next(self._ids)
+                self._socket.sendall(encode_request({**request, "id": request_id}))
+                self.awaiting_reply = True
+                reply = self._receive()
+                self.awaiting_reply = False
+                self._check_id(reply, request_id)
+                replies.append(reply)
+            return replies
+
+        ids = [next(self._ids) for _ in requests]
+        self._socket.sendall(
+            b"".join(
+                encode_request({**request, "id": request_id})
+                for request, request_id in zip(requests, ids)
+            )
+        )
+        self.awaiting_reply = True
+        by_id: dict[int, dict] = {}
+        while len(by_id) < len(ids):
+            reply = self._receive()
+            reply_id = reply.get("id")
+            if reply_id not in ids or reply_id in by_id:
+                raise ProtocolError(f"Unexpected reply id from server: {reply_id!r}")
+            by_id[reply_id] = reply
+        self.awaiting_reply = False
+        return [by_id[request_id] for request_id in ids]
+
+    def is_stale(self) -> bool:
+        """True when the server has closed the connection (or sent something unasked)
+        since the last reply; checked without blocking before each request."""
+        try:
+            readable, _, _ = select.select([self._socket], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _check_id(self, reply: dict, request_id: int):
+        reply_id = reply.get("id")
+        if self.pipelined is None:
+            self.pipelined = reply_id == request_id
+        elif self.pipelined and reply_id != request_id:
+            raise ProtocolError(f"Unexpected reply id from server: {reply_id!r}")
+
+    def _receive(self) -> dict:
+        while True:
+            reply = self._reader.pop()
+            if reply is not None:
+                if not isinstance(reply, dict):
+                    raise ProtocolError("Invalid response from server")
+                return reply
+            data = self._socket.recv(65536)
+            if not data:
+                raise ConnectionResetError("server closed the connection")
+            self._reader.feed(data)
@@ -0,0 +1,181 @@
+"""
+Local stand-in for the lab_remote_terminal_control instrument server.
+
+Speaks the framed JSON protocol of instrument_protocol.py on localhost so the
+*-client pulse generator kinds and the amp protector can be exercised without
+the lab hardware or the real server:
+
+    python instrument_stand_in.py --port 8888
+
+Requests with ``instrument: function_gen`` go to a recording function
+generator that accepts every method ClientKeysight33622A calls; requests
+without an instrument go to an E36312A supply model. ``--legacy`` stops echoing
+request ids, which makes clients fall back to one request at a time, as they
+do against older servers.
+"""
+
+import argparse
+import socket
+import socketserver
+import threading
+
+from client_keysight33622A import ClientKeysight33622A
+from instrument_client import InstrumentClient
+from instrument_protocol import FrameReader, ProtocolError, encode_request
+
+FUNCTION_GEN_METHODS = {
+    name
+    for name in dir(ClientKeysight33622A)
+    if not name.startswith("_") and not hasattr(InstrumentClient, name)
+}
+
+
+class StandInFunctionGenerator:
+    """Records every call; outputs and completion queries answer like the instrument."""
+
+    def __init__(self):
+        self.calls: list[tuple[str, tuple, dict]] = []
+        self.outputs: dict[int, int] = {}
+
+    def call(self, method: str, args: list, kwargs: dict):
+        if method not in FUNCTION_GEN_METHODS:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {method!r}")
+        self.calls.append((method, tuple(args), kwargs))
+        if method == "set_output":
+            channel, state = args
+            self.outputs[channel] = int(state)
+        elif method == "get_output":
+            return self.outputs.get(args[0], 0)
+        elif method in ("fire_pulse", "wait_for_completion"):
+            return "1"
+        return None
+
+
+class StandInPowerSupply:
+    """Keysight E36312A model: an output that reads back its voltage when on."""
+
+    def __init__(self, voltage: float = 5.0):
+        self.voltage = voltage
+        self.on: dict[int, bool] = {}
+
+    def call(self, method: str, args: list, kwargs: dict):
+        if method in ("init", "reset"):
+            self.on.clear()
+            return None
+        if method == "output_on":
+            self.on[args[0]] = True
+            return None
+        if method == "output_off":
+            self.on[args[0]] = False
+            return None
+        if method == "get_on_off":
+            return "1" if self.on.get(args[0]) else "0"
+        if method == "getVoltage":
+            return self.voltage if self.on.get(args[0]) else 0.0
+        if method == "getCurrent":
+            return 0.01 if self.on.get(args[0]) else 0.0
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {method!r}")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "StandInServer"
+
+    def setup(self):
+        self.server.track(self.request)
+
+    def finish(self):
+        self.server.untrack(self.request)
+
+    def handle(self):
+        reader = FrameReader()
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            reader.feed(data)
+            replies = []
+            try:
+                while (request := reader.pop()) is not None:
+                    replies.append(self.server.dispatch(request))
+            except ProtocolError as e:
+                replies.append({"error": str(e)})
+            except ConnectionAbortedError:
+                return  # the server chose to drop this connection
+            if replies:
+                self.request.sendall(b"".join(encode_request(reply) for reply in replies))
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host: str = "localhost", port: int = 8888, legacy: bool = False):
+        super().__init__((host, port), _Handler)
+        self.legacy = legacy
+        self.function_gen = StandInFunctionGenerator()
+        self.power_supply = StandInPowerSupply()
+        self._lock = threading.Lock()  # the set of client sockets
+        # one per instrument: they are independent, so a pulse in progress
+        # must not hold up the power supply
+        self._instrument_locks = {
+            "function_gen": threading.Lock(),
+            "power_supply": threading.Lock(),
+        }
+        self._clients: set = set()
+
+    def track(self, sock):
+        with self._lock:
+            self._clients.add(sock)
+
+    def untrack(self, sock):
+        with self._lock:
+            self._clients.discard(sock)
+
+    def server_close(self):
+        """Stop listening and drop every client connection, like a server restart."""
+        super().server_close()
+        with self._lock:
+            clients, self._clients = self._clients, set()
+        for sock in clients:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def dispatch(self, request: dict) -> dict:
+        if request.get("instrument") == "function_gen":
+            name, instrument = "function_gen", self.function_gen
+        else:
+            name, instrument = "power_supply", self.power_supply
+        try:
+            with self._instrument_locks[name]:
+                reply = {
+                    "result": instrument.call(
+                        request.get("method"),
+                        request.get("args") or [],
+                        request.get("kwargs") or {},
+                    )
+                }
+        except Exception as e:
+            reply = {"error": str(e)}
+        if not self.legacy and "id" in request:
+            reply["id"] = request["id"]
+        return reply
+
+
+def start_stand_in(port: int = 0, legacy: bool = False) -> StandInServer:
+    """Serve on a background thread; port 0 picks a free port (see server_address)."""
+    server = StandInServer(port=port, legacy=legacy)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--legacy", action="store_true", help="do not echo request ids")
+    args = parser.parse_args()
+    with StandInServer(args.host, args.port, args.legacy) as server:
+        print(f"Instrument stand-in listening on {args.host}:{args.port}")
+        server.serve_forever()
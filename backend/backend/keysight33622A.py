@@ -1,11 +1,15 @@
 import time
+from shadow_registers import ShadowRegisters
 from visaInst import visaInst
 
 
-class keysight33622A(visaInst):
+class keysight33622A(ShadowRegisters, visaInst):
     """
     Class for keysight 33622A AWG - Generalized implementation
     Provides individual functions for controlling different aspects of the waveform
+
+    Amplitude, offset, polarity, burst state and trigger source are cached
+    (see ShadowRegisters) and only written when they change.
     """
 
     def __init__(self, ipAddress: str, **kwargs):
@@ -17,6 +21,10 @@ class keysight33622A(visaInst):
         super().__init__(ipAddress, **kwargs)
 
         self.high_level = 0
+        # Wait around the trigger in trigger_with_polarity. With completion
+        # "opc" an *OPC? query replaces the fixed trigger_settle sleep.
+        self.trigger_settle = 0.5
+        self.completion = "sleep"
 
     def init(self):
         self.write("INIT")
@@ -58,8 +66,12 @@ class keysight33622A(visaInst):
         :param channel: Channel number (1 or 2)
         :param amplitude: Amplitude in Vpp
         """
+        if self._holds(channel, "amplitude", amplitude):
+            return
+        self._forget(channel, "amplitude")
         self.write(f":SOURce{channel}:VOLTage {amplitude}")
         self.write("*OPC")
+        self._remember(channel, "amplitude", amplitude)
 
     def set_offset(self, channel: int, offset: float):
         """
@@ -67,8 +79,12 @@ class keysight33622A(visaInst):
         :param channel: Channel number (1 or 2)
         :param offset: Offset in Volts
         """
+        if self._holds(channel, "offset", offset):
+            return
+        self._forget(channel, "offset")
         self.write(f":SOURce{channel}:VOLTage:OFFSet {offset}")
         self.write("*OPC")
+        self._remember(channel, "offset", offset)
 
     def set_phase(self, channel: int, phase: float):
         """
@@ -87,6 +103,7 @@ class keysight33622A(visaInst):
         :param amplitude: Amplitude in Vpp
         :param offset: DC offset in Volts
         """
+        self._forget(channel, "amplitude", "offset")
         self.write(f":SOURce{channel}:APPLy:PULSe {freq},{amplitude} VPP,{offset} V")
         self.write("*OPC")
 
@@ -105,15 +122,19 @@ class keysight33622A(visaInst):
         :param channel: Channel number (1 or 2)
         :param polarity: 'POSitive' or 'NEGative'
         """
+        if polarity not in ("POS", "NEG"):
+            raise ValueError("Polarity must be 'POS' or 'NEG'")
+        if self._holds(channel, "polarity", polarity):
+            return
+        self._forget(channel, "polarity")
         if polarity == "POS":
             # self.write(f':SOURce{channel}:BURSt:GATE:POLarity NORMal')
             self.write(f":OUTPut{channel}:POLarity NORMal")
-        elif polarity == "NEG":
+        else:
             # self.write(f':SOURce{channel}:BURSt:GATE:POLarity INVerted')
             self.write(f":OUTPut{channel}:POLarity INVerted")
-        else:
-            raise ValueError("Polarity must be 'POS' or 'NEG'")
         self.write("*OPC")
+        self._remember(channel, "polarity", polarity)
 
     def phase_sync(self):
         """Synchronize the phase of all channels"""
@@ -138,11 +159,72 @@ class keysight33622A(visaInst):
 
     def trigger_with_polarity(self, channel: int, high_level: float, polarity: str):
         self.set_pulse_polarity(channel, polarity, high_level)
-        time.sleep(0.5) # do I need time for the function generator to update its settings?
+        self._settle() # do I need time for the function generator to update its settings?
         self.immediate_trigger(channel)
-        time.sleep(0.5)
+        self._settle()
         self.write("*OPC")
 
+    def wait_for_completion(self):
+        """Block until every command sent so far has been executed."""
+        return self.query("*OPC?")
+
+    def _settle(self):
+        if self.completion == "opc":
+            self.wait_for_completion()
+        else:
+            time.sleep(self.trigger_settle)
+
+    def _pulse_settings(self, channel: int, high_level: float, polarity: str):
+        """(setting, value, command) for each setting set_pulse_polarity would make."""
+        if polarity == "POS":
+            offset, output_polarity = high_level / 2, "NORMal"
+        elif polarity == "NEG":
+            offset, output_polarity = -high_level / 2, "INVerted"
+        else:
+            raise ValueError("Polarity must be 'POS' or 'NEG'")
+        return [
+            ("amplitude", high_level, f":SOURce{channel}:VOLTage {high_level}"),
+            ("offset", offset, f":SOURce{channel}:VOLTage:OFFSet {offset}"),
+            ("polarity", polarity, f":OUTPut{channel}:POLarity {output_polarity}"),
+        ]
+
+    def pulse_program(self, channel: int, high_level: float, polarity: str) -> list[str]:
+        """
+        SCPI commands that configure and fire one pulse: the same settings as
+        set_pulse_polarity followed by immediate_trigger. Settings the
+        instrument already holds are left out.
+        :param channel: Channel number (1 or 2)
+        :param high_level: Pulse amplitude in Vpp
+        :param polarity: 'POS' or 'NEG'
+        """
+        changed = [
+            command
+            for setting, value, command in self._pulse_settings(channel, high_level, polarity)
+            if not self._holds(channel, setting, value)
+        ]
+        return [*changed, f":TRIGger{channel}"]
+
+    def run_program(self, commands: list[str]) -> str:
+        """
+        Send commands as one semicolon-joined message and wait for them with a
+        single *OPC? instead of a write and *OPC per command.
+        """
+        return self.query(";".join([*commands, "*OPC?"]))
+
+    def fire_pulse(self, channel: int, high_level: float, polarity: str):
+        """Configure and trigger one pulse in a single instrument round trip."""
+        changed = [
+            (setting, value)
+            for setting, value, _ in self._pulse_settings(channel, high_level, polarity)
+            if not self._holds(channel, setting, value)
+        ]
+        program = self.pulse_program(channel, high_level, polarity)
+        self._forget(channel, *(setting for setting, _ in changed))
+        result = self.run_program(program)
+        for setting, value in changed:
+            self._remember(channel, setting, value)
+        return result
+
     # Maintaining backward compatibility with original functions
     def filter_channel(self, phase: float, freq: float):
         """Legacy compatibility function for channel 1 settings"""
@@ -224,16 +306,25 @@ class keysight33622A(visaInst):
         self.write(f":SOURce{channel}:FUNCtion:PULSe:PERiod {period}")
         self.write(f":SOURce{channel}:FUNCtion:PULSe:WIDTh {width}")
         self.write(f":SOURce{channel}:FUNCtion:PULSe:TRANsition:BOTH {edge_time}")
+        self._forget(channel, "amplitude", "offset")
         self.enable_burst(channel)
         self.write("*OPC")
 
         # print(self.query('*OPC?'))
 
     def enable_burst(self, channel: int):
+        if self._holds(channel, "burst", True):
+            return
+        self._forget(channel, "burst")
         self.write(f":SOURce{channel}:BURSt:STATe ON")
+        self._remember(channel, "burst", True)
 
     def disable_burst(self, channel: int):
+        if self._holds(channel, "burst", False):
+            return
+        self._forget(channel, "burst")
         self.write(f":SOURce{channel}:BURSt:STATe OFF")
+        self._remember(channel, "burst", False)
 
     def set_thermal_source_mode(self):
         self.write(":SOURce1:FUNCtion SQUare")
@@ -255,7 +346,12 @@ class keysight33622A(visaInst):
         if source not in ["IMMediate", "EXTernal", "TIMer", "BUS"]:
             raise ValueError("Invalid trigger source. Must be one of IMMediate, EXTernal, TIMer, BUS.")
 
-        return self.write(f":TRIGger{channel}:SOURce {source}")
+        if self._holds(channel, "trigger_source", source):
+            return
+        self._forget(channel, "trigger_source")
+        result = self.write(f":TRIGger{channel}:SOURce {source}")
+        self._remember(channel, "trigger_source", source)
+        return result
 
 
 if __name__ == "__main__":
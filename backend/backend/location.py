@@ -17,4 +17,12 @@ else:
 
 
 DATA_DIR = os.path.join(BASE_DIR, "config")
+# Per-machine hardware settings; SWITCH_CONTROL_SETTINGS points elsewhere, e.g.
+# at a configuration for the simulator
+SYSTEM_SETTINGS = os.getenv(
+    "SWITCH_CONTROL_SETTINGS", os.path.join(BASE_DIR, "system_settings.yml")
+)
 WEB_DIR = os.path.join(BASE_DIR, "switch_web")
+
+# Port the backend serves the UI on; read by both the launcher and the server
+SERVE_PORT = 8854
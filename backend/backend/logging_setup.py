@@ -0,0 +1,147 @@
+"""
+Structured logging for the server and the hardware drivers.
+
+Modules log through ``logging.getLogger(__name__)``. configure_logging()
+puts a single queue handler on the root logger, so a call on the switching
+path only builds a record and puts it on a queue. Unlike the stock
+QueueHandler it does not format the record first: a listener thread does
+the message formatting, tracebacks included, and the file and terminal I/O.
+Arguments are therefore formatted a little later, so pass values that are
+not changed after the call. Per-pulse messages are DEBUG, which the default
+levels filter out before a record is even built.
+
+Records go to a rotating file as JSON lines, and optionally to the terminal
+as plain text. Each record carries ``op``, the ID of the switch operation
+that produced it: switch_operation() sets it for the current context, and
+asyncio.to_thread copies it into the worker thread that drives the hardware.
+
+Levels come from the ``logging`` section of system_settings.yml
+(models.LoggingSettings), e.g. to trace the relay board and the pulses:
+
+    logging:
+      levels:
+        numatoRelay: DEBUG
+        pulse_controller: DEBUG
+"""
+
+import atexit
+from contextlib import contextmanager
+import copy
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import queue
+from typing import Iterator
+import uuid
+
+from models import LoggingSettings
+
+operation_id: ContextVar[str | None] = ContextVar("operation_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "op"}
+
+_listener: QueueListener | None = None
+_handler: QueueHandler | None = None
+
+
+@contextmanager
+def switch_operation() -> Iterator[str]:
+    """Tag the records logged in this context with a new operation ID."""
+    op = uuid.uuid4().hex[:12]
+    token = operation_id.set(op)
+    try:
+        yield op
+    finally:
+        operation_id.reset(token)
+
+
+class _OperationFilter(logging.Filter):
+    """Stamps the operation ID while still in the thread that logged."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.op = operation_id.get()
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues records unformatted; the listener's sinks format them."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # a copy, since other handlers may still see the same record
+        return copy.copy(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "op": getattr(record, "op", None),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(settings: LoggingSettings) -> None:
+    """Route all logging through a queue to the sinks in ``settings``.
+
+    Calling it again replaces the previous configuration.
+    """
+    global _listener, _handler
+    stop_logging()
+
+    sinks: list[logging.Handler] = []
+    if settings.file:
+        file = RotatingFileHandler(
+            settings.file,
+            maxBytes=settings.max_bytes,
+            backupCount=settings.backup_count,
+            encoding="utf-8",
+        )
+        file.setFormatter(JsonFormatter())
+        sinks.append(file)
+    if settings.console_level:
+        console = logging.StreamHandler()
+        console.setLevel(settings.console_level.upper())
+        console.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)-7s %(name)s [%(op)s] %(message)s")
+        )
+        sinks.append(console)
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _handler = _DeferredQueueHandler(records)
+    _handler.addFilter(_OperationFilter())
+    _listener = QueueListener(records, *sinks, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(settings.level.upper())
+    for name, level in settings.levels.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+
+def stop_logging() -> None:
+    """Write out the queued records and detach the handlers."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for sink in _listener.handlers:
+            sink.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,136 @@
+"""
+Latency histograms of the switching path, by hardware phase and by command.
+
+A span reads time.monotonic() when it starts and when it ends, and adds the
+difference to a histogram with fixed buckets. The overhead is a bisect and a
+few integer additions under an uncontended lock. Phases are named after what
+they wait on, so a slow switch points at its instrument:
+
+    amp_off, amp_restore   E36312A amp supply
+    unblock, block         protection relay on the Numato board
+    wire_switch            routing relays on the Numato board, plus wire settle
+    trigger                pulse generator fire_pulse
+    pulse_hold             hold after each pulse
+    flip                   one whole pulse: wire switch, trigger and hold
+    prepare, finish        amp and protection relay together
+    persist                handing rows to the write-behind store
+    db_flush               one write-behind transaction
+
+The server exposes them in three ways: the get_metrics command, the
+Prometheus text format at /metrics, and a summary in AppState.metrics.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+from typing import Iterator
+
+# Upper bounds in seconds; a final +Inf bucket catches the rest
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding quantile ``q``; at most ``max``."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count * 1e3, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1e3, 3),
+            "p95_ms": round(self.quantile(0.95) * 1e3, 3),
+            "max_ms": round(self.max * 1e3, 3),
+            "last_ms": round(self.last * 1e3, 3),
+        }
+
+    def detail(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip((*BUCKETS, float("inf")), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else f"{bound:g}"] = cumulative
+        return {"count": self.count, "sum": self.sum, "max": self.max, "buckets": buckets}
+
+
+class Histograms:
+    """One Prometheus histogram family, with a histogram per label value."""
+
+    def __init__(self, name: str, label: str, help: str):
+        self.name = name
+        self.label = label
+        self.help = help
+        self._histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, key: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(key, time.monotonic() - started)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {key: h.summary() for key, h in sorted(self._histograms.items())}
+
+    def detail(self) -> dict[str, dict]:
+        with self._lock:
+            return {key: h.detail() for key, h in sorted(self._histograms.items())}
+
+    def prometheus(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, detail in self.detail().items():
+            labels = f'{self.label}="{key}"'
+            for bound, cumulative in detail["buckets"].items():
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {detail['sum']:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {detail['count']}")
+        return lines
+
+
+PHASE_SECONDS = Histograms(
+    "switch_control_phase_seconds", "phase", "Time spent in each hardware phase."
+)
+COMMAND_SECONDS = Histograms(
+    "switch_control_command_seconds", "command", "Wall time of each switch command."
+)
+
+
+def prometheus_text() -> str:
+    return "\n".join([*PHASE_SECONDS.prometheus(), *COMMAND_SECONDS.prometheus()]) + "\n"
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel
 from verification import Verification
 
@@ -69,3 +69,86 @@ class PulseGenInfo(BaseModel):
     active_kind: str
     created: bool = True
     message: Optional[str] = None
+
+
+# Switch planning models
+class PlannedPulse(BaseModel):
+    relay: str  # "R1".."R7"
+    index: int  # relay number passed to flip_left / flip_right
+    position: bool  # relay position once the pulse has fired
+    flip: Literal["left", "right"]
+
+
+class SwitchPlan(BaseModel):
+    command: str
+    target_channel: Optional[int] = None
+    pulses: list[PlannedPulse] = []
+    skipped: list[str] = []  # relays already in position, left alone
+    gap: float = 0.0  # seconds slept before each pulse
+    estimated_seconds: float = 0.0
+
+
+class TimingProfile(BaseModel):
+    """
+    Hold times (seconds) for each hardware step, read from the ``timing``
+    section of system_settings.yml. Settles are slept after the step's I/O
+    returns, as the fixed sleeps were, and the defaults match those sleeps.
+    """
+
+    # FunctionGeneratorPulseController
+    wire_settle: float = 0.050  # from wire switching to the pulse
+    pulse_hold: float = 0.050  # after the pulse, before the next wire switch
+    extra_hold: float = 0.0  # added after every pulse
+    unblock_settle: float = 0.050  # after the protection relay is switched on
+    # SimpleRelayPulseController: between relay steps (None -> pulse_sleep_time)
+    relay_step: Optional[float] = None
+    # Generator settle around trigger_with_polarity; "opc" waits on *OPC? instead
+    trigger_settle: float = 0.5
+    completion: Literal["sleep", "opc"] = "sleep"
+    # AmpProtector: hold after OUTP OFF, then poll until verified off
+    amp_off_settle: float = 0.4
+    amp_off_timeout: float = 2.0
+    amp_poll_interval: float = 0.05
+    # Skip the off/verify cycle when the amp was verified off this recently
+    amp_off_freshness: float = 2.0
+    # Default idle timeout of begin_switching_session
+    session_idle_timeout: float = 30.0
+    # Learn the real amp-off settle time and start polling just before it
+    adaptive: bool = False
+
+
+class HistoryRetention(BaseModel):
+    """
+    Bounds on the configuration history table, read from the ``history``
+    section of system_settings.yml and applied after every stash.
+    """
+
+    # Keep at most this many snapshots (None -> unbounded)
+    keep_last: Optional[int] = 1000
+    # Snapshots older than this many days are thinned to the newest one per day
+    thin_after_days: Optional[float] = None
+
+
+class LoggingSettings(BaseModel):
+    """
+    Log levels and sinks, read from the ``logging`` section of
+    system_settings.yml; see logging_setup.py.
+    """
+
+    level: str = "INFO"  # root level
+    # Logger (module) name -> level, e.g. {"pulse_controller": "DEBUG"}
+    levels: dict[str, str] = {}
+    # JSON lines, rotated at max_bytes with backup_count old files (None -> off)
+    file: Optional[str] = "switch_control.log"
+    max_bytes: int = 5_000_000
+    backup_count: int = 5
+    # Plain-text records at or above this level on the terminal (None -> off)
+    console_level: Optional[str] = "INFO"
+
+
+class RelayWearBase(BaseModel):
+    """Lifetime actuation counts; see relay_wear.py."""
+
+    pulses: dict[str, int] = {}  # cryogenic relay "R1".."R7" -> pulses fired
+    skipped: dict[str, int] = {}  # pulses tree memory mode did not need
+    routing: dict[str, int] = {}  # Numato relay "0".."7" -> on/off transitions
@@ -1,35 +1,71 @@
+import logging
 import time
+from typing import Callable
+
 import serial
 from verification import Verification
 
+logger = logging.getLogger(__name__)
+
+# The Numato firmware echoes every command and ends each reply with this prompt
+PROMPT = b">"
+# Unacknowledged writes allowed before their echoes are drained
+MAX_PENDING = 32
 
-class Relay(object):
-    """Numato Relay Class"""
 
-    def __init__(self, visa_name: str | None, resource_name_prefix: str = "A0M"):
+class Relay(object):
+    """
+    Numato Relay Class
+
+    Replies are read up to the ``>`` prompt rather than for a fixed byte count,
+    so a query returns as soon as the board has answered instead of waiting out
+    the serial timeout. Plain writes are pipelined: their echoes are drained
+    just before the next query (or once MAX_PENDING pile up).
+
+    The on/off state written to each relay is tracked, so update_relays can
+    set several relays with a single 'relay writeall'. ``on_switch``, when
+    set, is called with a mask of the relays a write actually turned on or
+    off (relays whose state was never known are not counted).
+    """
+
+    relay_count = 8
+    timeout = 0.25  # ceiling on a reply; a healthy board answers in a few ms
+
+    def __init__(
+        self,
+        visa_name: str | None,
+        resource_name_prefix: str = "A0M",
+        timeout: float | None = None,
+    ):
+        self._state = 0  # last on/off written to each relay, one bit per relay
+        self._known = 0  # relays written since the port was opened
+        self._writeall: bool | None = None  # firmware support, probed on first use
+        self.on_switch: Callable[[int], None] | None = None
         if visa_name is None:
             self.serial = None
-            print("No relay connected. Debug mode.")
+            logger.info("No relay connected. Debug mode.")
             return
 
         self.serial = serial.Serial()
         self.serial.baudrate = 9600
         self.serial.port = visa_name
-        self.serial.timeout = 0.25
+        self.serial.timeout = timeout if timeout is not None else self.timeout
         self.OptChan = 1
+        self._pending = 0  # writes whose echo and prompt have not been read yet
         self.serial.open()
+        self.serial.reset_input_buffer()
 
         # print(f"resource name for {visa_name}: ", self.getVersion())
 
         resp = self.getVersion()
-        print("got response to getVersion(): ", resp)
+        logger.debug("got response to getVersion(): %s", resp)
 
         # if resp contains the resource_name_prefix
         if resource_name_prefix in resp:
         # if resp.startswith(resource_name_prefix):
-            print("Relay Connected")
+            logger.info("Relay connected on %s", visa_name)
         else:
-            print("Relay not connected")
+            logger.info("No relay on %s", visa_name)
             self.serial.close()
             self.serial = None
             raise ConnectionError("Failed to connect to the relay.")
@@ -41,21 +77,48 @@ class Relay(object):
         else:
             return "NO SERIAL. DEBUG RETURN"
 
-    def write(self, string: str):
+    def read_reply(self) -> str:
+        """Read up to and including the next prompt (or until the timeout)."""
         if self.serial:
-            self.serial.write(str.encode(string + "\n\r"))
+            return self.serial.read_until(PROMPT).decode(errors="replace")
         else:
-            print("NO SERIAL. DEBUG SENDING: ", string)
-        # print(string)
+            return "NO SERIAL. DEBUG RETURN"
 
-    def query(self, string: str, bits: int):
+    def write(self, string: str):
+        self.write_many([string])
+
+    def write_many(self, commands: list[str]):
+        """Send several commands in one serial write without waiting for replies."""
+        if self.serial:
+            if self._pending + len(commands) > MAX_PENDING:
+                self.drain()
+            self.serial.write("".join(c + "\n\r" for c in commands).encode())
+            self._pending += len(commands)
+        else:
+            for string in commands:
+                logger.debug("NO SERIAL. DEBUG SENDING: %s", string)
+
+    def drain(self):
+        """Consume the echo of every pipelined write, so the next reply is ours."""
+        while self._pending:
+            self._pending -= 1
+            if not self.read_reply().endswith(PROMPT.decode()):
+                # timed out: the board is out of step, start from a clean buffer
+                self.serial.reset_input_buffer()
+                self._pending = 0
+
+    def query(self, string: str, bits: int = 0):
+        """Send ``string`` and return the reply. ``bits`` is no longer used; the
+        read ends at the prompt."""
+        if self.serial:
+            self.drain()
         self.write(string)
-        # _ = self.read(bits)
-        data = self.read(bits)
-        # Remove the sent command and newlines from the response
-        # also remove trailing '>' character
-        response = data.replace(string, "").replace("\n", "").replace("\r", "")[:-1]
-        return response
+        data = self.read_reply()
+        if self.serial:
+            self._pending -= 1
+        # Remove the sent command, newlines and the trailing '>' prompt
+        response = data.replace(string, "").replace("\n", "").replace("\r", "")
+        return response.removesuffix(PROMPT.decode())
 
     def get_channel(self, chan: int) -> str:
         if chan == 10:
@@ -109,26 +172,94 @@ class Relay(object):
         assert verification.verified, "Verification not complete"
         chan = self.get_channel(channel)
         self.write("relay on " + chan)
+        self._track(channel, True)
         return True
 
     def turn_off(self, channel: int, verification: Verification):
         assert verification.verified, "Verification not complete"
         chan = self.get_channel(channel)
         self.write("relay off " + chan)
+        self._track(channel, False)
         return True
 
+    def _track(self, channel: int, on: bool):
+        if channel >= self.relay_count:
+            return
+        bit = 1 << channel
+        previous, known = self._state, self._known & bit
+        self._known |= bit
+        if on:
+            self._state |= bit
+        else:
+            self._state &= ~bit
+        self._switched(previous, known)
+
+    def _switched(self, previous: int, known: int):
+        """Report relays in ``known`` whose state differs from ``previous``."""
+        changed = (previous ^ self._state) & known
+        if changed and self.on_switch is not None:
+            self.on_switch(changed)
+
+    def write_mask(self, mask: int, verification: Verification):
+        """Set every relay at once; bit n of ``mask`` turns relay n on."""
+        assert verification.verified, "Verification not complete"
+        all_relays = (1 << self.relay_count) - 1
+        if self._writeall is None and self.serial:
+            # Firmware without writeall ignores it, so probe once by reading
+            # back; a board already in the target state proves nothing.
+            if self.read_all_mask() == mask:
+                self._state, self._known = mask, all_relays
+                return
+            self.write(f"relay writeall {mask:0{self.relay_count // 4}x}")
+            self._writeall = self.read_all_mask() == mask
+            if not self._writeall:
+                logger.warning("relay writeall unsupported, using per-relay writes")
+        elif self._writeall is not False:
+            self.write(f"relay writeall {mask:0{self.relay_count // 4}x}")
+        if self._writeall is not False:
+            previous, known = self._state, self._known
+            self._state, self._known = mask, all_relays
+            self._switched(previous, known)
+            return
+        self._write_each({r: bool(mask >> r & 1) for r in range(self.relay_count)})
+
+    def update_relays(self, states: dict[int, bool], verification: Verification):
+        """
+        Set the relays in ``states`` and leave the others as they are. One
+        'relay writeall' when every other relay's state is known; otherwise
+        only the named relays are written, one command each.
+        """
+        assert verification.verified, "Verification not complete"
+        touched = 0
+        mask = self._state
+        for relay, on in states.items():
+            touched |= 1 << relay
+            mask = mask | 1 << relay if on else mask & ~(1 << relay)
+        all_relays = (1 << self.relay_count) - 1
+        if self._known | touched == all_relays and self._writeall is not False:
+            self.write_mask(mask, verification)
+        else:
+            self._write_each(states)
+
+    def _write_each(self, states: dict[int, bool]):
+        self.write_many(
+            [f"relay {'on' if on else 'off'} {self.get_channel(r)}" for r, on in states.items()]
+        )
+        for relay, on in states.items():
+            self._track(relay, on)
+
     def chan_read(self, channel: int):
         chan = self.get_channel(channel)
         ans = self.query("relay read " + chan, 100)
 
-        print("response: ", ans)
+        logger.debug("response: %s", ans)
 
         if "on" in ans:
             return True
         elif "off" in ans:
             return False
         else:
-            print("returning non matching answer")
+            logger.warning("returning non matching answer: %s", ans)
             return ans
 
     def send_pulse(self, channel: int, pulseWidth: float, verification: Verification):
@@ -183,8 +314,15 @@ class Relay(object):
     def ReadAll(self):
         return self.query("relay readall", 100)
 
+    def read_all_mask(self) -> int:
+        """State of every relay as a bitmask; bit n set means relay n is on."""
+        if not self.serial:
+            return 0
+        return int(self.ReadAll().strip(), 16)
+
     def Reset(self):
         self.write("reset")
+        self._known = 0
 
     def SetWavelength(self, wl: int | str):
         if wl == 1550:
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark of the per-switch persistence cost.
+
+Compares, on throwaway database files, the old path (a fresh Session per
+switch that selects the TreeState row, updates it and commits, with SQLite's
+default rollback journal and full sync) with the current one (WAL,
+synchronous=NORMAL, one long-lived connection and a prebuilt upsert):
+
+    python persist_benchmark.py --switches 500
+"""
+
+import argparse
+from pathlib import Path
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from db import TreeState, apply_pragmas
+from models import SwitchState, Tree
+from persistence import WriteBehindStore
+
+
+def _tree_json(channel: int) -> str:
+    relays = {f"R{i}": SwitchState(pos=bool(channel & 1), color=False) for i in range(1, 8)}
+    return Tree(**relays, activated_channel=channel).model_dump_json()
+
+
+def _engine(path: Path, tuned: bool):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    if tuned:
+        event.listen(engine, "connect", apply_pragmas)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _summary(samples: list[float]) -> str:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    return f"mean {statistics.mean(samples) * 1e3:7.3f} ms   p95 {p95 * 1e3:7.3f} ms"
+
+
+def before(path: Path, switches: int) -> list[float]:
+    engine = _engine(path, tuned=False)
+    samples = []
+    for n in range(switches):
+        started = time.perf_counter()
+        with Session(engine) as session:
+            row = session.exec(select(TreeState).where(TreeState.id == 1)).one_or_none()
+            if row is None:
+                row = TreeState(id=1)
+            row.tree_json = _tree_json(n % 8)
+            session.add(row)
+            session.commit()
+        samples.append(time.perf_counter() - started)
+    engine.dispose()
+    return samples
+
+
+def after(path: Path, switches: int) -> list[float]:
+    """One flush per switch: the worst case, with no coalescing at all."""
+    engine = _engine(path, tuned=True)
+    store = WriteBehindStore(engine)
+    samples = []
+    for n in range(switches):
+        started = time.perf_counter()
+        store.save("tree", {"tree_json": _tree_json(n % 8)})
+        store.flush()
+        samples.append(time.perf_counter() - started)
+    store.close()
+    engine.dispose()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--switches", type=int, default=500)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        old = before(Path(directory, "before.db"), args.switches)
+        new = after(Path(directory, "after.db"), args.switches)
+    print(f"{args.switches} tree persists per run")
+    print(f"  before (session + select + commit, default journal): {_summary(old)}")
+    print(f"  after  (WAL, persistent connection, upsert):         {_summary(new)}")
+    print(f"  speedup {statistics.mean(old) / statistics.mean(new):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Write-behind persistence of the singleton rows (tree, settings, button labels,
+relay wear).
+
+Commands hand the latest row contents to a WriteBehindStore and return at
+once. A single writer thread owns one long-lived database connection. After
+the first change it waits at most ``flush_interval`` seconds, then writes
+everything still pending in one transaction. Rapid changes, such as a script
+stepping through channels, therefore cost one commit per interval instead of
+one per switch. Each row is written with a prebuilt ``INSERT ... ON CONFLICT
+DO UPDATE``, so a flush neither selects the row first nor builds a new
+statement. At most ``flush_interval`` seconds of state is at risk in a
+crash, and close() flushes synchronously on shutdown.
+"""
+
+import logging
+import threading
+import time
+from typing import Any
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.dml import Insert
+from sqlmodel import SQLModel
+
+from db import ButtonLabels, RelayWear, Settings, TreeState
+from metrics import PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Longest time a change waits before it is committed
+FLUSH_INTERVAL = 0.25
+
+ROW_MODELS: dict[str, type[SQLModel]] = {
+    "tree": TreeState,
+    "settings": Settings,
+    "labels": ButtonLabels,
+    "wear": RelayWear,
+}
+
+
+def singleton_upsert(model: type[SQLModel]) -> Insert:
+    """``INSERT ... ON CONFLICT(id) DO UPDATE`` of every column of ``model``."""
+    table = model.__table__
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in table.columns
+            if column.name != "id"
+        },
+    )
+
+
+UPSERTS: dict[str, Insert] = {
+    row: singleton_upsert(model) for row, model in ROW_MODELS.items()
+}
+COLUMNS: dict[str, set[str]] = {
+    row: {column.name for column in model.__table__.columns}
+    for row, model in ROW_MODELS.items()
+}
+
+
+class WriteBehindStore:
+    def __init__(self, engine: Engine, flush_interval: float = FLUSH_INTERVAL):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._condition = threading.Condition()
+        # Serializes flushes from the writer thread and from flush()/close()
+        self._write_lock = threading.Lock()
+        self._connection: Connection | None = None
+        self._thread: threading.Thread | None = None
+        self._closing = False
+        self.flushes = 0
+        self.last_error: str | None = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._closing = False
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def save(self, row: str, data: dict[str, Any]):
+        """Queue ``data`` as the new contents of singleton ``row``; a later save
+        of the same row before the flush replaces it."""
+        if row not in ROW_MODELS:
+            raise ValueError(f"Unknown persisted row: {row}")
+        with self._condition:
+            self._pending[row] = data
+            self._condition.notify()
+
+    def flush(self):
+        """Write everything pending now, on the calling thread."""
+        with self._condition:
+            pending, self._pending = self._pending, {}
+        self._write(pending)
+
+    def close(self):
+        """Stop the writer thread and flush what is still pending."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            with self._condition:
+                self._closing = True
+                self._condition.notify()
+            thread.join()
+        self.flush()
+        with self._write_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing:
+                    self._condition.wait()
+                if self._closing:
+                    return
+                # Let further changes within the interval join this transaction
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closing and (remaining := deadline - time.monotonic()) > 0:
+                    self._condition.wait(remaining)
+                pending, self._pending = self._pending, {}
+            self._write(pending)
+
+    def _write(self, pending: dict[str, dict[str, Any]]):
+        if not pending:
+            return
+        with self._write_lock:
+            try:
+                if self._connection is None:
+                    self._connection = self.engine.connect()
+                with PHASE_SECONDS.span("db_flush"), self._connection.begin():
+                    for row, data in pending.items():
+                        values = {
+                            key: value for key, value in data.items() if key in COLUMNS[row]
+                        }
+                        self._connection.execute(UPSERTS[row], {**values, "id": 1})
+                self.flushes += 1
+            except Exception as e:
+                self._drop_connection()
+                self.last_error = str(e)
+                logger.error("Failed to persist %s: %s", ", ".join(pending), e)
+                # Keep the data for the next flush unless newer data arrived
+                with self._condition:
+                    for row, data in pending.items():
+                        self._pending.setdefault(row, data)
+
+    def _drop_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
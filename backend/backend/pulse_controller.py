@@ -1,16 +1,21 @@
-import subprocess
+import logging
 import os
 import time
+from typing import Callable
 from verification import Verification
 from numatoRelay import Relay
+from relay_discovery import find_relay
 from node import Node, MaybeNode
 
 from abc import ABC, abstractmethod
-from models import SwitchState, Tree, T
+from models import PlannedPulse, SwitchState, TimingProfile, Tree, T
+from instrument_protocol import InstrumentServerError
+from metrics import PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
 
 # Environment configuration
 FG_IP = os.getenv("FG_IP", "10.9.0.50")
-EXTRA_SLEEP_TIME = 0
 
 # self.fg = keysight33622A("10.9.0.18")
 
@@ -22,6 +27,9 @@ class PulseGenerator(ABC):
     Concrete implementations must hide the connection details (local VISA, client socket, or dev mock).
     """
 
+    # Rough wall time of one fire_pulse call, used for switch-time estimates.
+    trigger_seconds: float = 0.0
+
     @abstractmethod
     def connect(self) -> None:
         pass
@@ -50,6 +58,44 @@ class PulseGenerator(ABC):
         """
         pass
 
+    def fire_pulse(self, channel: int, amplitude: float, polarity: str) -> None:
+        """
+        Configure and trigger one pulse in as few instrument round trips as the
+        backend allows. Backends without a compiled program fall back to
+        trigger_with_polarity.
+        """
+        self.trigger_with_polarity(channel, amplitude, polarity)
+
+    def trigger_sequence(
+        self,
+        channel: int,
+        pulses: list[tuple[float, str]],
+        before_pulse: Callable[[int], None] | None = None,
+        after_pulse: Callable[[int], None] | None = None,
+    ) -> None:
+        """
+        Fire a multi-relay switch: one (amplitude, polarity) pulse per relay,
+        each sent as a single program. ``before_pulse(i)`` / ``after_pulse(i)``
+        run around pulse ``i`` so the caller can wire-switch in between.
+        """
+        for i, (amplitude, polarity) in enumerate(pulses):
+            if before_pulse is not None:
+                before_pulse(i)
+            self.fire_pulse(channel, amplitude, polarity)
+            if after_pulse is not None:
+                after_pulse(i)
+
+    def wait_for_completion(self) -> bool:
+        """
+        Block until the instrument has executed everything sent so far.
+        Returns False when the backend cannot confirm completion.
+        """
+        return False
+
+    def apply_timing(self, timing: TimingProfile) -> None:
+        """Adopt the trigger settle settings of the hardware timing profile."""
+        pass
+
 
 class DevModePulseGenerator(PulseGenerator):
     """A no-op pulse generator for development that logs calls instead of talking to hardware."""
@@ -60,28 +106,39 @@ class DevModePulseGenerator(PulseGenerator):
 
     def connect(self) -> None:
         self.connected = True
-        print(f"[{self.name}] connect() -> OK (mock)")
+        logger.info("[%s] connect() -> OK (mock)", self.name)
 
     def disconnect(self) -> None:
         self.connected = False
-        print(f"[{self.name}] disconnect() -> OK (mock)")
+        logger.info("[%s] disconnect() -> OK (mock)", self.name)
 
     def setup_pulse(self, width: float) -> None:
-        print(f"[{self.name}] setup_pulse(width={width})")
+        logger.info("[%s] setup_pulse(width=%s)", self.name, width)
 
     def setup_trigger(self, channel, source: str) -> None:
-        print(f"[{self.name}] setup_trigger(channel={channel}, source={source})")
+        logger.info("[%s] setup_trigger(channel=%s, source=%s)", self.name, channel, source)
 
     def set_output(self, channel: int, enabled: int | bool) -> None:
-        print(f"[{self.name}] set_output(channel={channel}, enabled={int(bool(enabled))})")
+        logger.info(
+            "[%s] set_output(channel=%s, enabled=%d)", self.name, channel, bool(enabled)
+        )
 
     def trigger_with_polarity(self, channel: int, amplitude: float, polarity: str) -> None:
-        print(f"[{self.name}] trigger_with_polarity(channel={channel}, amplitude={amplitude}, polarity={polarity})")
+        logger.info(
+            "[%s] trigger_with_polarity(channel=%s, amplitude=%s, polarity=%s)",
+            self.name,
+            channel,
+            amplitude,
+            polarity,
+        )
 
 
 class KeysightPulseGenerator(PulseGenerator):
     """Adapter around a direct VISA Keysight 33622A connection."""
 
+    # fire_pulse is one query round trip
+    trigger_seconds = 0.02
+
     def __init__(self, ip: str):
         # Lazy import to avoid import errors when module not available
         from keysight33622A import keysight33622A  # type: ignore
@@ -105,17 +162,32 @@ class KeysightPulseGenerator(PulseGenerator):
         self._impl.set_output(channel, int(bool(enabled)))
 
     def trigger_with_polarity(self, channel: int, amplitude: float, polarity: str) -> None:
-        print(f"triggering with polarity: {polarity} and amplitude: {amplitude}")
+        logger.debug("triggering with polarity: %s and amplitude: %s", polarity, amplitude)
         self._impl.trigger_with_polarity(channel, amplitude, polarity)
 
+    def fire_pulse(self, channel: int, amplitude: float, polarity: str) -> None:
+        self._impl.fire_pulse(channel, amplitude, polarity)
+
+    def wait_for_completion(self) -> bool:
+        self._impl.wait_for_completion()
+        return True
+
+    def apply_timing(self, timing: TimingProfile) -> None:
+        self._impl.trigger_settle = timing.trigger_settle
+        self._impl.completion = timing.completion
+
 
 class ClientKeysightPulseGenerator(PulseGenerator):
     """Adapter around client socket connection to a Keysight 33622A (shared VISA via server)."""
 
+    # fire_pulse is one server round trip; 1.0 s if the server lacks it
+    trigger_seconds = 0.02
+
     def __init__(self):
         from client_keysight33622A import ClientKeysight33622A  # type: ignore
 
         self._impl = ClientKeysight33622A()
+        self._fire_pulse_supported = True
 
     def connect(self) -> None:
         self._impl.connect()
@@ -133,14 +205,40 @@ class ClientKeysightPulseGenerator(PulseGenerator):
         self._impl.set_output(channel, int(bool(enabled)))
 
     def trigger_with_polarity(self, channel: int, amplitude: float, polarity: str) -> None:
-
-        print(f"triggering with polarity: {polarity} and amplitude: {amplitude}")
+        logger.debug("triggering with polarity: %s and amplitude: %s", polarity, amplitude)
         self._impl.trigger_with_polarity(channel, amplitude, polarity)
 
+    def fire_pulse(self, channel: int, amplitude: float, polarity: str) -> None:
+        if self._fire_pulse_supported:
+            try:
+                self._impl.fire_pulse(channel, amplitude, polarity)
+                return
+            except InstrumentServerError as e:
+                # Older servers have no fire_pulse method; nothing was sent.
+                # Any other error may come after the pulse: never fire again.
+                if not e.unknown_method:
+                    raise
+                logger.warning("Server has no fire_pulse, falling back to trigger_with_polarity")
+                self._fire_pulse_supported = False
+                self.trigger_seconds = 1.0
+        self.trigger_with_polarity(channel, amplitude, polarity)
+
+    def wait_for_completion(self) -> bool:
+        try:
+            self._impl.wait_for_completion()
+            return True
+        except InstrumentServerError as e:
+            if not e.unknown_method:
+                raise
+            return False
+
 
 class TeledynePulseGenerator(PulseGenerator):
     """Adapter around a direct VISA Teledyne T3AFG200 connection."""
 
+    # fire_pulse is one query round trip
+    trigger_seconds = 0.02
+
     def __init__(self, ip: str):
         from teledyneT3AFG200 import teledyneT3AFG200  # type: ignore
 
@@ -163,9 +261,20 @@ class TeledynePulseGenerator(PulseGenerator):
         self._impl.set_output(channel, int(bool(enabled)))
 
     def trigger_with_polarity(self, channel: int, amplitude: float, polarity: str) -> None:
-        print(f"triggering with polarity: {polarity} and amplitude: {amplitude}")
+        logger.debug("triggering with polarity: %s and amplitude: %s", polarity, amplitude)
         self._impl.trigger_with_polarity(channel, amplitude, polarity)
 
+    def fire_pulse(self, channel: int, amplitude: float, polarity: str) -> None:
+        self._impl.fire_pulse(channel, amplitude, polarity)
+
+    def wait_for_completion(self) -> bool:
+        self._impl.wait_for_completion()
+        return True
+
+    def apply_timing(self, timing: TimingProfile) -> None:
+        self._impl.trigger_settle = timing.trigger_settle
+        self._impl.completion = timing.completion
+
 
 class ClientTeledynePulseGenerator(PulseGenerator):
     """Adapter around client socket connection to a Teledyne T3AFG200 (shared VISA via server).
@@ -174,10 +283,14 @@ class ClientTeledynePulseGenerator(PulseGenerator):
     method names, and the server picks the physical backend (--keysight / --teledyne).
     """
 
+    # fire_pulse is one server round trip; 1.0 s if the server lacks it
+    trigger_seconds = 0.02
+
     def __init__(self):
         from client_teledyneT3AFG200 import ClientTeledyneT3AFG200  # type: ignore
 
         self._impl = ClientTeledyneT3AFG200()
+        self._fire_pulse_supported = True
 
     def connect(self) -> None:
         self._impl.connect()
@@ -195,9 +308,33 @@ class ClientTeledynePulseGenerator(PulseGenerator):
         self._impl.set_output(channel, int(bool(enabled)))
 
     def trigger_with_polarity(self, channel: int, amplitude: float, polarity: str) -> None:
-        print(f"triggering with polarity: {polarity} and amplitude: {amplitude}")
+        logger.debug("triggering with polarity: %s and amplitude: %s", polarity, amplitude)
         self._impl.trigger_with_polarity(channel, amplitude, polarity)
 
+    def fire_pulse(self, channel: int, amplitude: float, polarity: str) -> None:
+        if self._fire_pulse_supported:
+            try:
+                self._impl.fire_pulse(channel, amplitude, polarity)
+                return
+            except InstrumentServerError as e:
+                # Older servers have no fire_pulse method; nothing was sent.
+                # Any other error may come after the pulse: never fire again.
+                if not e.unknown_method:
+                    raise
+                logger.warning("Server has no fire_pulse, falling back to trigger_with_polarity")
+                self._fire_pulse_supported = False
+                self.trigger_seconds = 1.0
+        self.trigger_with_polarity(channel, amplitude, polarity)
+
+    def wait_for_completion(self) -> bool:
+        try:
+            self._impl.wait_for_completion()
+            return True
+        except InstrumentServerError as e:
+            if not e.unknown_method:
+                raise
+            return False
+
 
 class PulseController(ABC):
     """
@@ -213,10 +350,20 @@ class PulseController(ABC):
     generator, then use the FunctionGeneratorPulseController class.
     """
 
-    def __init__(self, sleep_time: float = 0.050, pulse_time: float = 50):
-        self.relay_board = self.initialize_relay()
+    def __init__(
+        self,
+        sleep_time: float = 0.050,
+        pulse_time: float = 50,
+        timing: TimingProfile | None = None,
+        relay_board: Relay | None = None,
+    ):
+        # an explicit board (possibly a debug placeholder) skips port discovery
+        self.relay_board = (
+            relay_board if relay_board is not None else self.initialize_relay()
+        )
         self.sleep_time = sleep_time
         self.pulse_time = pulse_time
+        self.timing = timing if timing is not None else TimingProfile()
 
     @abstractmethod
     def flip_left(self, channel: int, verification: Verification):
@@ -252,31 +399,44 @@ class PulseController(ABC):
     def block_pulser(self, verification: Verification):
         pass
 
-    def initialize_relay(self):
-        relay_board = None  # Initialize with a default value
-        serial_ports = get_serial_ports()
-
-        if serial_ports:
-            for port in serial_ports:
-                try:
-                    relay_board = Relay(port)
-                    print("Relay initialized successfully")
-                    for r in range(8):
-                        relay_board.turn_off(
-                            r,
-                            Verification(
-                                verified=True, timestamp=1, userConfirmed=True
-                            ),
-                        )
-                    return relay_board
-                except Exception as error:
-                    print(f"Failed to initialize relay: {error}")
-        else:
-            print("No serial ports found, using debug mode")
-
-        # If we reach here, either no ports were found or all connection attempts failed
-        relay_board = Relay(None)
+    def flip_sequence(
+        self,
+        pulses: list[PlannedPulse],
+        verification: Verification,
+        gap: float = 0.0,
+        on_pulse: Callable[[PlannedPulse], None] | None = None,
+    ):
+        """
+        Fire a planned sequence of pulses in order, sleeping ``gap`` seconds
+        before each one. ``on_pulse`` is called after every pulse that fired.
+        """
+        for pulse in pulses:
+            time.sleep(gap)
+            if pulse.flip == "right":
+                self.flip_right(pulse.index, verification)
+            else:
+                self.flip_left(pulse.index, verification)
+            if on_pulse is not None:
+                on_pulse(pulse)
+
+    def estimated_flip_seconds(self, flip: str) -> float:
+        """Expected wall time of one flip_left ('left') or flip_right ('right')."""
+        return 0.0
 
+    def estimated_unblock_seconds(self) -> float:
+        """Expected wall time of unblock_pulser."""
+        return 0.0
+
+    def initialize_relay(self):
+        relay_board = find_relay()
+        if relay_board is None:
+            logger.warning("No relay board found, using debug mode")
+            return Relay(None)
+
+        logger.info("Relay initialized successfully")
+        relay_board.write_mask(
+            0, Verification(verified=True, timestamp=1, userConfirmed=True)
+        )
         return relay_board
 
     def cleanup(self):
@@ -284,46 +444,48 @@ class PulseController(ABC):
             self.relay_board.close()
 
 
-# Scan the system for serial ports
-def get_serial_ports():
-    ports: list[str | None] = []
-    commands = ["ls /dev/ttyUSB*", "ls /dev/ttyACM*", "ls /dev/*usb*"]
-
-    for cmd in commands:
-        try:
-            output = subprocess.check_output(cmd, shell=True, text=True)
-            ports.extend(output.strip().split("\n"))
-        except subprocess.CalledProcessError:
-            # Ignore the error if no devices are found for the current pattern
-            continue
-
-    print("these are the ports: ", ports)
-
-    return ports
-
-
 class SimpleRelayPulseController(PulseController):
     """
     A simple implementation of the PulseController that uses a relay board to send
     voltage pulses to the cryogenic relays.
     """
 
-    def __init__(self, sleep_time: float = 0.050, pulse_time: float = 50):
-        super().__init__(sleep_time, pulse_time)
+    def __init__(
+        self,
+        sleep_time: float = 0.050,
+        pulse_time: float = 50,
+        timing: TimingProfile | None = None,
+        relay_board: Relay | None = None,
+    ):
+        super().__init__(sleep_time, pulse_time, timing, relay_board)
+
+    @property
+    def relay_step(self) -> float:
+        """Settle after each relay step; the profile overrides sleep_time."""
+        if self.timing.relay_step is not None:
+            return self.timing.relay_step
+        return self.sleep_time
+
+    def _step(self, action, *args):
+        # the relay writes return before the contacts move, so settle afterwards
+        action(*args)
+        time.sleep(self.relay_step)
 
     def flip_left(self, channel: int, verification: Verification):
-        self.relay_board.turn_off(0, verification)
-        time.sleep(self.sleep_time)
-        self.relay_board.send_pulse(channel, self.pulse_time, verification)
-        time.sleep(self.sleep_time)
+        with PHASE_SECONDS.span("flip"):
+            self._step(self.relay_board.turn_off, 0, verification)
+            self._step(self.relay_board.send_pulse, channel, self.pulse_time, verification)
 
     def flip_right(self, channel: int, verification: Verification):
-        self.relay_board.turn_on(0, verification)
-        time.sleep(self.sleep_time)
-        self.relay_board.send_pulse(channel, self.pulse_time, verification)
-        time.sleep(self.sleep_time)
-        self.relay_board.turn_off(0, verification)
-        time.sleep(self.sleep_time)
+        with PHASE_SECONDS.span("flip"):
+            self._step(self.relay_board.turn_on, 0, verification)
+            self._step(self.relay_board.send_pulse, channel, self.pulse_time, verification)
+            self._step(self.relay_board.turn_off, 0, verification)
+
+    def estimated_flip_seconds(self, flip: str) -> float:
+        # each step settles after its write; send_pulse also holds the pulse width
+        steps = 3 if flip == "right" else 2
+        return steps * self.relay_step + self.pulse_time / 1000
 
 
     def cryo_mode(self):
@@ -361,8 +523,10 @@ class FunctionGeneratorPulseController(PulseController):
         pulse_time: float = 50,
         pulse_amplitude: float = 2.5,
         generator: PulseGenerator | None = None,
+        timing: TimingProfile | None = None,
+        relay_board: Relay | None = None,
     ):
-        super().__init__(sleep_time, pulse_time)
+        super().__init__(sleep_time, pulse_time, timing, relay_board)
 
         # turn 1 into 1 1
         # turn 2 into 1 0 1
@@ -428,7 +592,7 @@ class FunctionGeneratorPulseController(PulseController):
         # edit the config file for the dhcpd server with: sudo nano /etc/dhcp/dhcpd.conf
 
         # function generator, used for sending pulses
-        self._connect_and_setup_generator(self.fg)
+        self.prepare_generator(self.fg)
 
         self.pulse_amplitude = pulse_amplitude
 
@@ -441,88 +605,152 @@ class FunctionGeneratorPulseController(PulseController):
 
     def set_generator(self, generator: PulseGenerator):
         """Swap the active pulse generator at runtime."""
+        self.prepare_generator(generator)
+        self.use_generator(generator)
+
+    def use_generator(self, generator: PulseGenerator):
+        """Make an already set-up generator the active one, releasing the old one."""
+        previous = getattr(self, "fg", None)
+        self.fg = generator
         try:
-            if hasattr(self, "fg") and self.fg:
-                self.fg.disconnect()
+            if previous is not None and previous is not generator:
+                previous.disconnect()
         except Exception as e:
-            print(f"Warning: previous generator disconnect failed: {e}")
-        self.fg = generator
-        self._connect_and_setup_generator(self.fg)
+            logger.warning("previous generator disconnect failed: %s", e)
 
-    def _connect_and_setup_generator(self, generator: PulseGenerator):
+    def prepare_generator(self, generator: PulseGenerator) -> bool:
+        """Connect and configure ``generator``; False if that failed."""
+        generator.apply_timing(self.timing)
         try:
             generator.connect()
             generator.setup_pulse(width=0.050)  # 50 ms
             generator.set_output(1, 1)
             generator.setup_trigger(1, "BUS") # BUS/Manual allows triggering from python
+            return True
 
         except Exception as e:
-            print(f"Failed to initialize pulse generator: {e}")
+            logger.error("Failed to initialize pulse generator: %s", e)
+            return False
 
     def flip_left(self, channel: int, verification: Verification):
-        self.wire_switch(channel, verification)
-        time.sleep(0.05)
-        print("SENDING POSITIVE PULSE")
-        self.fg.trigger_with_polarity(1, self.pulse_amplitude, "POS")
-        time.sleep(0.05)
-
-        time.sleep(EXTRA_SLEEP_TIME)
+        with PHASE_SECONDS.span("flip"):
+            self._route(channel, verification)
+            logger.debug("sending positive pulse", extra={"channel": channel})
+            with PHASE_SECONDS.span("trigger"):
+                self.fg.fire_pulse(1, self.pulse_amplitude, "POS")
+            self._hold_after_pulse()
 
     def flip_right(self, channel: int, verification: Verification):
-        self.wire_switch(channel, verification)
-        time.sleep(0.05)
-        print("SENDING NEGATIVE PULSE")
-        self.fg.trigger_with_polarity(1, self.pulse_amplitude, "NEG")
-        time.sleep(0.05)
-        time.sleep(EXTRA_SLEEP_TIME)
+        with PHASE_SECONDS.span("flip"):
+            self._route(channel, verification)
+            logger.debug("sending negative pulse", extra={"channel": channel})
+            with PHASE_SECONDS.span("trigger"):
+                self.fg.fire_pulse(1, self.pulse_amplitude, "NEG")
+            self._hold_after_pulse()
+
+    def _route(self, channel: int, verification: Verification):
+        """Wire-switch to ``channel``, then let the contacts settle."""
+        with PHASE_SECONDS.span("wire_switch"):
+            self.wire_switch(channel, verification)
+            time.sleep(self.timing.wire_settle)
+
+    def _hold_after_pulse(self):
+        with PHASE_SECONDS.span("pulse_hold"):
+            # In "opc" mode the hold starts once the generator confirms the trigger ran.
+            if self.timing.completion == "opc":
+                self.fg.wait_for_completion()
+            time.sleep(self.timing.pulse_hold + self.timing.extra_hold)
+
+    def flip_sequence(
+        self,
+        pulses: list[PlannedPulse],
+        verification: Verification,
+        gap: float = 0.0,
+        on_pulse: Callable[[PlannedPulse], None] | None = None,
+    ):
+        """
+        Same timing as repeated flip_left / flip_right, but the generator gets
+        the whole switch as one pulse sequence: a single program per pulse,
+        with wire switching done between pulses.
+        """
+
+        # monotonic times the current pulse, and its trigger, started
+        marks = {"flip": 0.0, "trigger": 0.0}
+
+        def before_pulse(i: int):
+            time.sleep(gap)
+            marks["flip"] = time.monotonic()
+            self._route(pulses[i].index, verification)
+            marks["trigger"] = time.monotonic()
+
+        def after_pulse(i: int):
+            PHASE_SECONDS.observe("trigger", time.monotonic() - marks["trigger"])
+            self._hold_after_pulse()
+            PHASE_SECONDS.observe("flip", time.monotonic() - marks["flip"])
+            if on_pulse is not None:
+                on_pulse(pulses[i])
+
+        polarities = ["NEG" if pulse.flip == "right" else "POS" for pulse in pulses]
+        self.fg.trigger_sequence(
+            1,
+            [(self.pulse_amplitude, polarity) for polarity in polarities],
+            before_pulse,
+            after_pulse,
+        )
+
+    def estimated_flip_seconds(self, flip: str) -> float:
+        timing = self.timing
+        return (
+            timing.wire_settle
+            + self.fg.trigger_seconds
+            + timing.pulse_hold
+            + timing.extra_hold
+        )
+
+    def estimated_unblock_seconds(self) -> float:
+        return self.timing.unblock_settle
 
     def wire_switch(self, channel: int, verification: Verification):
         """
-        Wire switch the function generator to the specified channel.
+        Wire switch the function generator to the specified channel, setting
+        every routing relay on the path in one relay-board transaction.
         """
+        states = self.routing_states(channel)
+        logger.debug("wire switch to channel %d: %s", channel, states)
+        self.relay_board.update_relays(states, verification)
+
+    def routing_states(self, channel: int) -> dict[int, bool]:
+        """Routing relay index -> on, for the relays on the path to ``channel``."""
         channel = 7 - channel
         binary = bin(channel)[2:]
         # binary should be 3 digits long
         binary = binary.zfill(3)
-        print("binary: ", binary)
 
+        states: dict[int, bool] = {}
         current_node = self.top_node
 
-        for bit in enumerate(binary):
+        for bit in binary:
             if type(current_node) is not Node:
-                print("Reached a None or end node, stopping.")
-                continue
-
-            print(
-                f"starting with bit {bit} of {binary} at node {current_node.relay_name}"
-            )
-            if bit[1] == "0":
-                # if not current_node.polarity:
-                current_node.polarity = True
-                idx = int(current_node.relay_index)
-                # print(f"flip cryo relay {current_node.relay_index} left")
-                # v.pulse_controller.flip_left(idx, verification)
-                print("turning OFF relay ", idx)
-                self.relay_board.turn_off(idx, verification)
-            else:
-                # if current_node.polarity:
-                # print(f"flip cryo relay {current_node.relay_index} right")
-                current_node.polarity = False
-                idx = int(current_node.relay_index)
-                # v.pulse_controller.flip_right(idx, verification)
-                print("turning ON relay ", idx)
-                self.relay_board.turn_on(idx, verification)
+                logger.debug("Reached a None or end node, stopping.")
+                break
+
+            # bit "0" routes left (relay off), "1" routes right (relay on)
+            current_node.polarity = bit == "0"
+            states[int(current_node.relay_index)] = bit == "1"
 
             current_node = current_node.to_next()
+        return states
 
     def unblock_pulser(self, verification: Verification):
-        print("turning on the protection relay")
-        self.relay_board.turn_on(0, verification)
-        time.sleep(0.05)
+        logger.debug("turning on the protection relay")
+        with PHASE_SECONDS.span("unblock"):
+            self.relay_board.turn_on(0, verification)
+            time.sleep(self.timing.unblock_settle)
 
     def block_pulser(self, verification: Verification):
-        print("turning off the protection relay")
-        self.relay_board.turn_off(0, verification)
+        logger.debug("turning off the protection relay")
+        with PHASE_SECONDS.span("block"):
+            self.relay_board.turn_off(0, verification)
 
     def cleanup(self):
         self.relay_board.Reset()
@@ -531,7 +759,7 @@ class FunctionGeneratorPulseController(PulseController):
             try:
                 self.fg.disconnect()
             except Exception as e:
-                print(f"Warning: pulse generator disconnect failed: {e}")
+                logger.warning("pulse generator disconnect failed: %s", e)
 
 
 # Registry and factory for runtime switching.
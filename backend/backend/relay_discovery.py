@@ -0,0 +1,126 @@
+"""
+Finding the Numato relay board among the machine's serial ports.
+
+Ports come from pyserial's list_ports rather than globbing /dev. Boards that
+answered before are remembered in a small JSON cache by USB serial number, so
+the known-good port is tried first on its own. Only if that fails are the
+remaining USB serial ports probed, in parallel and with a short timeout,
+Numato's vendor id first. NUMATO_RELAY_PORT names a port to use instead of
+searching, such as the pseudo-terminal of the simulated board.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import logging
+import os
+from pathlib import Path
+
+from serial.tools import list_ports
+from serial.tools.list_ports_common import ListPortInfo
+
+from numatoRelay import Relay
+
+logger = logging.getLogger(__name__)
+
+NUMATO_VID = 0x2A19
+PORT_CACHE_FILE = "relay_port_cache.json"
+PORT_ENV = "NUMATO_RELAY_PORT"
+# A Numato board answers 'ver' within a few ms; anything slower is not one
+PROBE_TIMEOUT = 0.1
+
+
+def _device_key(port: ListPortInfo) -> str | None:
+    return port.serial_number or port.location
+
+
+def candidate_ports(cache: dict | None = None) -> list[ListPortInfo]:
+    """USB serial ports in probe order: cached boards, Numato VID, other USB."""
+    cache = cache or {}
+    known = cache.get("devices", {})
+    last_port = cache.get("last_port")
+
+    def rank(port: ListPortInfo) -> int:
+        if _device_key(port) in known:
+            return 0
+        if port.device == last_port:
+            return 1
+        if port.vid == NUMATO_VID:
+            return 2
+        return 3
+
+    usb_ports = [port for port in list_ports.comports() if port.vid is not None]
+    return sorted(usb_ports, key=rank)
+
+
+def load_port_cache(path: str = PORT_CACHE_FILE) -> dict:
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_port_cache(port: ListPortInfo, path: str = PORT_CACHE_FILE):
+    cache = load_port_cache(path)
+    cache["last_port"] = port.device
+    key = _device_key(port)
+    if key:
+        cache.setdefault("devices", {})[key] = port.device
+    try:
+        Path(path).write_text(json.dumps(cache, indent=2))
+    except OSError as e:
+        logger.warning("Could not write relay port cache: %s", e)
+
+
+def _probe(port: ListPortInfo) -> Relay | None:
+    try:
+        return Relay(port.device, timeout=PROBE_TIMEOUT)
+    except Exception as error:
+        logger.debug("No relay on %s: %s", port.device, error)
+        return None
+
+
+def find_relay(cache_path: str = PORT_CACHE_FILE) -> Relay | None:
+    """Open the relay board, or return None if no port answers like one."""
+    if port := os.getenv(PORT_ENV):
+        try:
+            return Relay(port)
+        except Exception as error:
+            logger.error("No relay on %s=%s: %s", PORT_ENV, port, error)
+            return None
+    cache = load_port_cache(cache_path)
+    ports = candidate_ports(cache)
+    logger.info("candidate relay ports: %s", [port.device for port in ports])
+
+    if ports and _is_cached(ports[0], cache):
+        # The known-good board answers on its own in a few ms; no threads needed.
+        relay = _probe(ports[0])
+        if relay is not None:
+            return _found(relay, ports[0], cache_path)
+        ports = ports[1:]
+    if not ports:
+        return None
+
+    found: tuple[Relay, ListPortInfo] | None = None
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        probes = {pool.submit(_probe, port): port for port in ports}
+        for probe in as_completed(probes):
+            relay = probe.result()
+            if relay is None:
+                continue
+            if found is None:
+                found = (relay, probes[probe])
+            else:
+                relay.serial.close()
+    if found is None:
+        return None
+    return _found(*found, cache_path)
+
+
+def _is_cached(port: ListPortInfo, cache: dict) -> bool:
+    return _device_key(port) in cache.get("devices", {}) or port.device == cache.get("last_port")
+
+
+def _found(relay: Relay, port: ListPortInfo, cache_path: str) -> Relay:
+    relay.serial.timeout = Relay.timeout
+    save_port_cache(port, cache_path)
+    return relay
@@ -0,0 +1,75 @@
+"""
+Actuation counters for the cryogenic relays and the Numato routing relays.
+
+Teledyne cryogenic relays have a finite switching life, and so do the room
+temperature relays on the Numato board that route the pulse to them. The
+counters here record every pulse fired at R1-R7, every pulse that tree memory
+mode skipped because the relay was already in position, and every on/off
+transition of each Numato relay.
+
+The counters are plain lists of ints. Only the thread that holds the hardware
+lock increments them, and readers take a copy, so neither side takes a lock
+on the switching path. The server checkpoints snapshot() through the
+write-behind store, which batches it with the other rows it flushes.
+"""
+
+from typing import Iterable
+
+from models import RelayWearBase
+
+CRYO_RELAYS = tuple(f"R{i}" for i in range(1, 8))
+ROUTING_RELAYS = 8  # Numato relays 0-7; relay 0 is the pulser protection relay
+
+
+class RelayWearCounters:
+    def __init__(self):
+        self._pulses = [0] * len(CRYO_RELAYS)
+        self._skipped = [0] * len(CRYO_RELAYS)
+        self._routing = [0] * ROUTING_RELAYS
+        # bumped on every change, so the server can tell when to checkpoint
+        self.version = 0
+
+    def pulsed(self, index: int):
+        """A pulse fired at cryogenic relay R``index``."""
+        self._pulses[index - 1] += 1
+        self.version += 1
+
+    def skipped(self, relays: Iterable[str]):
+        """Pulses tree memory mode did not fire because ``relays`` were in position."""
+        for relay in relays:
+            self._skipped[CRYO_RELAYS.index(relay)] += 1
+            self.version += 1
+
+    def routing_switched(self, changed: int):
+        """Numato relays whose bit is set in ``changed`` turned on or off."""
+        relay = 0
+        while changed:
+            if changed & 1 and relay < ROUTING_RELAYS:
+                self._routing[relay] += 1
+            changed >>= 1
+            relay += 1
+        self.version += 1
+
+    def snapshot(self) -> RelayWearBase:
+        return RelayWearBase(
+            pulses=dict(zip(CRYO_RELAYS, list(self._pulses))),
+            skipped=dict(zip(CRYO_RELAYS, list(self._skipped))),
+            routing={str(relay): count for relay, count in enumerate(list(self._routing))},
+        )
+
+    def load(self, wear: RelayWearBase):
+        """Start counting from a checkpoint."""
+        self._pulses = [wear.pulses.get(relay, 0) for relay in CRYO_RELAYS]
+        self._skipped = [wear.skipped.get(relay, 0) for relay in CRYO_RELAYS]
+        self._routing = [wear.routing.get(str(relay), 0) for relay in range(ROUTING_RELAYS)]
+
+    def reset(self, relay: str):
+        """Zero the counts of a replaced relay: "R1".."R7" or Numato "0".."7"."""
+        if relay in CRYO_RELAYS:
+            self._pulses[CRYO_RELAYS.index(relay)] = 0
+            self._skipped[CRYO_RELAYS.index(relay)] = 0
+        elif relay.isdigit() and int(relay) < ROUTING_RELAYS:
+            self._routing[int(relay)] = 0
+        else:
+            raise ValueError(f"Unknown relay: {relay}")
+        self.version += 1
@@ -0,0 +1,1482 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+import html
+import logging
+import mimetypes
+from pathlib import Path
+import socket
+import threading
+import time
+from typing import Any, Callable
+
+from lab_link import (
+    CommandContext,
+    CommandError,
+    InviteEvent,
+    LabSync,
+    LanPassphraseAuth,
+    ReactiveModel,
+    SQLiteAuthStore,
+)
+import psutil
+from pydantic import Field
+from sqlmodel import Session, select
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import (
+    FileResponse,
+    HTMLResponse,
+    PlainTextResponse,
+)
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from uvicorn import Server
+import yaml
+
+from ampProtector import AmpProtector
+from configuration_history import (
+    DEFAULT_PAGE_SIZE,
+    apply_retention,
+    history_page,
+    record_stash,
+    snapshot_detail,
+    snapshot_labels,
+)
+from db import (
+    ButtonLabels,
+    ConfigurationSnapshot,
+    RelayWear,
+    Settings,
+    TreeState,
+    create_db_and_tables,
+    engine,
+)
+from logging_setup import configure_logging, stop_logging, switch_operation
+from metrics import BUCKETS, COMMAND_SECONDS, PHASE_SECONDS, prometheus_text
+from location import SERVE_PORT, SYSTEM_SETTINGS, WEB_DIR
+from numatoRelay import Relay
+from persistence import WriteBehindStore
+from relay_wear import RelayWearCounters
+from switch_journal import JournalRecord, SwitchJournal
+from switch_scheduler import LatestWins
+from models import (
+    ButtonLabelsBase,
+    PlannedPulse,
+    RelayWearBase,
+    SettingsBase,
+    HistoryRetention,
+    LoggingSettings,
+    SwitchPlan,
+    TimingProfile,
+    Tree,
+)
+from pulse_controller import (
+    FunctionGeneratorPulseController,
+    PulseController,
+    PulseGenerator,
+    SimpleRelayPulseController,
+    make_pulse_generator,
+)
+from switch_planner import (
+    TREE_CHILDREN,
+    active_path,
+    channel_plan,
+    re_assert_plan,
+    reset_plan,
+    toggle_plan,
+)
+from verification import Verification
+
+
+PULSE_TIME = 50
+SLEEP_TIME = 0.030
+# Seconds each device gets to come up before the UI shows it as timed out.
+# A device that answers later is still adopted.
+BRING_UP_TIMEOUTS = {
+    "relay_board": 5.0,
+    "pulse_generator": 10.0,
+    "power_supply": 10.0,
+}
+
+
+logger = logging.getLogger(__name__)
+
+
+def _read_system_config() -> dict[str, Any]:
+    path = Path(SYSTEM_SETTINGS)
+    if not path.exists():
+        return {}
+    with path.open() as file:
+        return yaml.safe_load(file) or {}
+
+
+auth_store = SQLiteAuthStore("switch_control_auth.db")
+remote_access = LanPassphraseAuth(
+    store=auth_store,
+    cookie_name="switch_control_session",
+    allowed_origins={
+        "http://127.0.0.1:5173",
+        "http://localhost:5173",
+        "http://127.0.0.1:1420",
+        "http://localhost:1420",
+        "tauri://localhost",
+    },
+)
+
+# Migrate the old system-settings passphrase once, if one was configured. After
+# that the persistent auth store is authoritative, so rotating the passphrase
+# does not require editing a configuration file.
+legacy_remote_passphrase = _read_system_config().get("remote_access_passphrase")
+if not remote_access.configured and legacy_remote_passphrase:
+    remote_access.setup_passphrase(str(legacy_remote_passphrase))
+
+
+class ReactiveSwitchState(ReactiveModel):
+    pos: bool = False
+    color: bool = False
+
+
+class ReactiveTreeState(ReactiveModel):
+    R1: ReactiveSwitchState = Field(default_factory=ReactiveSwitchState)
+    R2: ReactiveSwitchState = Field(default_factory=ReactiveSwitchState)
+    R3: ReactiveSwitchState = Field(default_factory=ReactiveSwitchState)
+    R4: ReactiveSwitchState = Field(default_factory=ReactiveSwitchState)
+    R5: ReactiveSwitchState = Field(default_factory=ReactiveSwitchState)
+    R6: ReactiveSwitchState = Field(default_factory=ReactiveSwitchState)
+    R7: ReactiveSwitchState = Field(default_factory=ReactiveSwitchState)
+    activated_channel: int = 0
+
+
+class ReactiveButtonLabels(ReactiveModel):
+    label_0: str = "Ch 1"
+    label_1: str = "Ch 2"
+    label_2: str = "Ch 3"
+    label_3: str = "Ch 4"
+    label_4: str = "Ch 5"
+    label_5: str = "Ch 6"
+    label_6: str = "Ch 7"
+    label_7: str = "Ch 8"
+
+
+class ReactiveSettings(ReactiveModel):
+    cryo_mode: bool = False
+    cryo_voltage: float = 2.5
+    regular_voltage: float = 5.0
+    tree_memory_mode: bool = False
+    title_label: str = "Title Here"
+    pulse_generator_kind: str = "dev"
+    pulse_generator_ip: str | None = None
+
+
+class ReactivePulseGeneratorInfo(ReactiveModel):
+    requested_kind: str | None = None
+    requested_ip: str | None = None
+    active_kind: str = "dev"
+    created: bool = True
+    message: str | None = None
+
+
+class ReactiveDeviceStatus(ReactiveModel):
+    status: str = "pending"  # pending | ready | missing | error | timeout
+    message: str | None = None
+    seconds: float | None = None
+
+
+class ReactiveHardwareState(ReactiveModel):
+    relay_board: ReactiveDeviceStatus = Field(default_factory=ReactiveDeviceStatus)
+    pulse_generator: ReactiveDeviceStatus = Field(default_factory=ReactiveDeviceStatus)
+    power_supply: ReactiveDeviceStatus = Field(default_factory=ReactiveDeviceStatus)
+
+
+class ReactiveRelayWear(ReactiveModel):
+    pulses: dict[str, int] = Field(default_factory=dict)
+    skipped: dict[str, int] = Field(default_factory=dict)
+    routing: dict[str, int] = Field(default_factory=dict)
+
+
+class ReactiveMetrics(ReactiveModel):
+    # name -> count, mean_ms, p50_ms, p95_ms, max_ms, last_ms (see metrics.py)
+    phases: dict[str, dict[str, int | float]] = Field(default_factory=dict)
+    commands: dict[str, dict[str, int | float]] = Field(default_factory=dict)
+
+
+class ReactiveRemoteAccessState(ReactiveModel):
+    invite_id: str | None = None
+    invite_status: str = "idle"
+
+
+class AppState(ReactiveModel):
+    tree_state: ReactiveTreeState = Field(default_factory=ReactiveTreeState)
+    button_labels: ReactiveButtonLabels = Field(default_factory=ReactiveButtonLabels)
+    settings: ReactiveSettings = Field(default_factory=ReactiveSettings)
+    pulse_generator: ReactivePulseGeneratorInfo = Field(
+        default_factory=ReactivePulseGeneratorInfo
+    )
+    hardware: ReactiveHardwareState = Field(default_factory=ReactiveHardwareState)
+    relay_wear: ReactiveRelayWear = Field(default_factory=ReactiveRelayWear)
+    metrics: ReactiveMetrics = Field(default_factory=ReactiveMetrics)
+    remote_access: ReactiveRemoteAccessState = Field(
+        default_factory=ReactiveRemoteAccessState
+    )
+
+
+sync = LabSync(auth=remote_access)
+state = sync.bind_state(AppState())
+
+
+def _publish_invite_status(event: InviteEvent) -> None:
+    """Publish lifecycle state, never the one-use invitation credential."""
+    with sync.batch():
+        state.remote_access.invite_id = event.invite_id
+        state.remote_access.invite_status = event.status
+
+
+remote_access.on_invite_event(_publish_invite_status)
+
+
+class CryoRelayManager:
+    """Owns hardware resources only; live application state lives in ``state``.
+
+    Construction touches no hardware: the relay board is a debug placeholder,
+    the generator is the dev generator and the supply is not connected until
+    _bring_up_hardware() opens each of them.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        function_gen: bool = True,
+        sleep_time: float | None = None,
+        timing: TimingProfile | None = None,
+        journal: SwitchJournal | None = None,
+    ):
+        self.enabled = enabled
+        self.journal = journal
+        self.wear = RelayWearCounters()
+        self.lock = threading.Lock()
+        timing = timing if timing is not None else TimingProfile()
+        self.timing = timing
+        if function_gen:
+            fg_kwargs: dict[str, Any] = {
+                "timing": timing,
+                "relay_board": Relay(None),
+            }
+            if sleep_time is not None:
+                fg_kwargs["sleep_time"] = sleep_time
+            self._pulse_controller: PulseController = FunctionGeneratorPulseController(
+                **fg_kwargs
+            )
+        else:
+            self._pulse_controller = SimpleRelayPulseController(
+                timing=timing, relay_board=Relay(None)
+            )
+        self._amp_protector = AmpProtector(
+            on=True, disabled=False, use_client=True, timing=timing, connect=False
+        )
+
+    def cleanup(self) -> None:
+        self._pulse_controller.cleanup()
+
+    def open_relay_board(self) -> Relay:
+        """Find and zero the relay board; a debug placeholder if there is none."""
+        return self._pulse_controller.initialize_relay()
+
+    def use_relay_board(self, board: Relay) -> tuple[str, str | None]:
+        self._pulse_controller.relay_board = board
+        if board.serial is None:
+            return "missing", "No relay board found; relay writes are only printed"
+        board.on_switch = self.wear.routing_switched
+        return "ready", None
+
+    def discard_relay_board(self, board: Relay) -> None:
+        """Close a board that was opened but never made current."""
+        if board.serial is not None:
+            board.serial.close()
+
+    def connect_amp(self) -> bool:
+        return self._amp_protector.connect()
+
+    def discard_amp(self, connected: bool) -> None:
+        source = getattr(self._amp_protector, "source", None)
+        if connected and source is not None:
+            source.disconnect()
+
+    def use_amp(self, connected: bool) -> tuple[str, str | None]:
+        if connected:
+            return "ready", None
+        return "error", "Amp supply server unreachable; requests keep retrying"
+
+    def turn_off_amp(self, force: bool = False) -> None:
+        if self.enabled:
+            with PHASE_SECONDS.span("amp_off"):
+                self._amp_protector.turn_off_amp(force)
+
+    def flip_left(self, index: int, verification: Verification) -> None:
+        if self.enabled:
+            self._pulse_controller.flip_left(index, verification)
+
+    def flip_right(self, index: int, verification: Verification) -> None:
+        if self.enabled:
+            self._pulse_controller.flip_right(index, verification)
+
+    def unblock_pulser(self, verification: Verification) -> None:
+        if self.enabled:
+            self._pulse_controller.unblock_pulser(verification)
+
+    def block_pulser(self, verification: Verification) -> None:
+        if self.enabled:
+            self._pulse_controller.block_pulser(verification)
+
+    def turn_on_if_previously_on(self) -> None:
+        if self.enabled:
+            with PHASE_SECONDS.span("amp_restore"):
+                self._amp_protector.turn_on_if_previously_on()
+
+    def execute_plan(
+        self,
+        plan: SwitchPlan,
+        verification: Verification,
+        on_pulse: Callable[[PlannedPulse], None],
+    ) -> None:
+        """Fire every pulse of ``plan`` from a single worker thread.
+
+        ``on_pulse`` is called with each pulse once it has fired, so the caller
+        can publish the positions actually reached even if a later pulse fails.
+        """
+        if not self.enabled:
+            for pulse in plan.pulses:
+                on_pulse(pulse)
+            return
+        self._pulse_controller.flip_sequence(
+            plan.pulses, verification, plan.gap, on_pulse
+        )
+
+    def prepare_switching(self, verification: Verification) -> None:
+        with PHASE_SECONDS.span("prepare"):
+            self.turn_off_amp()
+            self.unblock_pulser(verification)
+
+    def finish_switching(self, verification: Verification) -> None:
+        with PHASE_SECONDS.span("finish"):
+            self.turn_on_if_previously_on()
+            self.block_pulser(verification)
+
+    def run_switch(
+        self,
+        plan: SwitchPlan,
+        verification: Verification,
+        completed: list[PlannedPulse],
+        prepare: bool = True,
+    ) -> None:
+        """Amp off, unblock, fire ``plan`` and restore, all on the calling thread.
+
+        With ``prepare`` False (an open switching session) only the pulses run.
+        Every planned pulse is journaled once the switch is over, whether it
+        fired or not.
+        """
+        started = time.time()
+        fired_at: list[float] = []
+        # False while preparing: if that fails, no pulse reached the generator
+        executing = False
+
+        def on_pulse(pulse: PlannedPulse) -> None:
+            fired_at.append(time.time())
+            completed.append(pulse)
+            if self.enabled:
+                self.wear.pulsed(pulse.index)
+
+        try:
+            if not prepare:
+                executing = True
+                self.execute_plan(plan, verification, on_pulse)
+                return
+            self.prepare_switching(verification)
+            try:
+                executing = True
+                self.execute_plan(plan, verification, on_pulse)
+            finally:
+                self.finish_switching(verification)
+        finally:
+            self._journal(plan, prepare, started, fired_at, executing)
+
+    def count_skipped(self, plan: SwitchPlan) -> None:
+        """Count the pulses tree memory mode left out of ``plan``."""
+        if self.enabled and plan.skipped:
+            self.wear.skipped(plan.skipped)
+
+    def _journal(
+        self,
+        plan: SwitchPlan,
+        prepared: bool,
+        started: float,
+        fired_at: list[float],
+        executed: bool,
+    ) -> None:
+        if self.journal is None or not self.enabled:
+            return
+        finished = time.time()
+        amplitude = getattr(self._pulse_controller, "pulse_amplitude", float("nan"))
+        records = []
+        for i, pulse in enumerate(plan.pulses):
+            if i < len(fired_at):
+                outcome, fired = "ok", fired_at[i]
+            else:
+                # the first pulse that did not complete is the one that failed,
+                # unless the switch never got past preparing the hardware
+                failed = executed and i == len(fired_at)
+                outcome, fired = ("failed" if failed else "not_fired"), 0.0
+            records.append(
+                JournalRecord(
+                    0,
+                    plan.command,
+                    plan.target_channel,
+                    pulse.index,
+                    -1 if pulse.flip == "right" else 1,
+                    pulse.position,
+                    outcome,
+                    prepared,
+                    amplitude,
+                    started,
+                    fired,
+                    finished,
+                )
+            )
+        self.journal.append(records)
+
+    def estimate_plan_seconds(self, plan: SwitchPlan, prepared: bool = False) -> float:
+        """Expected wall time of ``plan``, including amp shutoff and unblocking
+        unless a switching session has already ``prepared`` the hardware."""
+        if not plan.pulses:
+            return 0.0
+        seconds = len(plan.pulses) * plan.gap
+        if self.enabled:
+            controller = self._pulse_controller
+            if not prepared:
+                seconds += self._amp_protector.estimated_off_seconds()
+                seconds += controller.estimated_unblock_seconds()
+            seconds += sum(
+                controller.estimated_flip_seconds(pulse.flip) for pulse in plan.pulses
+            )
+        return seconds
+
+    def set_pulse_amplitude(self, settings: ReactiveSettings) -> None:
+        if isinstance(self._pulse_controller, FunctionGeneratorPulseController):
+            self._pulse_controller.pulse_amplitude = (
+                settings.cryo_voltage
+                if settings.cryo_mode
+                else settings.regular_voltage
+            )
+
+    def open_pulse_generator(
+        self, kind: str, ip: str | None
+    ) -> tuple[PulseGenerator | None, ReactivePulseGeneratorInfo]:
+        """Create and set up the generator ``kind`` without making it active yet.
+
+        Falls back to the dev generator when ``kind`` cannot be created.
+        """
+        requested_kind = (kind or "dev").lower()
+        if not isinstance(self._pulse_controller, FunctionGeneratorPulseController):
+            return None, ReactivePulseGeneratorInfo(
+                requested_kind=requested_kind,
+                requested_ip=ip,
+                active_kind="simple-relay",
+                message="Simple relay controller in use; no external generator",
+            )
+        try:
+            generator = make_pulse_generator(requested_kind, ip)
+        except Exception as exc:
+            fallback = make_pulse_generator("dev", None)
+            self._pulse_controller.prepare_generator(fallback)
+            return fallback, ReactivePulseGeneratorInfo(
+                requested_kind=requested_kind,
+                requested_ip=ip,
+                active_kind="dev",
+                created=False,
+                message=f"Falling back to dev generator: {exc}",
+            )
+        ready = self._pulse_controller.prepare_generator(generator)
+        return generator, ReactivePulseGeneratorInfo(
+            requested_kind=requested_kind,
+            requested_ip=ip,
+            active_kind=requested_kind,
+            message=None if ready else "Generator did not answer during setup",
+        )
+
+    def discard_pulse_generator(
+        self, opened: tuple[PulseGenerator | None, ReactivePulseGeneratorInfo]
+    ) -> None:
+        generator, _ = opened
+        if generator is not None:
+            generator.disconnect()
+
+    def use_pulse_generator(self, generator: PulseGenerator | None) -> None:
+        if generator is not None and isinstance(
+            self._pulse_controller, FunctionGeneratorPulseController
+        ):
+            self._pulse_controller.use_generator(generator)
+
+
+services: CryoRelayManager | None = None
+store = WriteBehindStore(engine)
+history_retention = HistoryRetention()
+hardware_command_lock = asyncio.Lock()
+# adopt_late tasks of devices that missed their bring-up timeout
+late_adoptions: set[asyncio.Task] = set()
+# request_channel calls waiting for their turn collapse into the newest
+channel_requests = LatestWins()
+# RelayWearCounters.version last handed to the store
+wear_checkpoint = 0
+
+
+def cryo_manager() -> CryoRelayManager:
+    if services is None:
+        raise RuntimeError("hardware services have not started")
+    return services
+
+
+def _relay(name: str) -> ReactiveSwitchState:
+    return getattr(state.tree_state, name)
+
+
+def _positions() -> dict[str, bool]:
+    return {relay_name: _relay(relay_name).pos for relay_name in TREE_CHILDREN}
+
+
+def _active_path() -> tuple[list[str], int]:
+    return active_path(_positions())
+
+
+def _refresh_derived_tree_state() -> None:
+    path, channel = _active_path()
+    active = set(path)
+    for relay_name in TREE_CHILDREN:
+        _relay(relay_name).color = relay_name in active
+    state.tree_state.activated_channel = channel
+
+
+def _verification(data: dict[str, Any]) -> Verification:
+    return Verification.model_validate(data)
+
+
+def _tree_from_persisted(tree: Tree) -> ReactiveTreeState:
+    return ReactiveTreeState.model_validate(tree.model_dump())
+
+
+def _tree_for_database() -> Tree:
+    return Tree.model_validate(state.tree_state.model_dump(mode="json"))
+
+
+def _persist_tree() -> None:
+    with PHASE_SECONDS.span("persist"):
+        store.save("tree", {"tree_json": _tree_for_database().model_dump_json()})
+
+
+def _persist_settings() -> None:
+    with PHASE_SECONDS.span("persist"):
+        store.save("settings", state.settings.model_dump(mode="json"))
+
+
+def _persist_labels() -> None:
+    with PHASE_SECONDS.span("persist"):
+        store.save("labels", state.button_labels.model_dump(mode="json"))
+
+
+def _publish_metrics() -> None:
+    state.metrics = ReactiveMetrics(
+        phases=PHASE_SECONDS.summary(), commands=COMMAND_SECONDS.summary()
+    )
+
+
+def _checkpoint_wear() -> None:
+    """Publish the relay wear counters and queue them for the next store flush,
+    if they changed since the last checkpoint."""
+    global wear_checkpoint
+    wear = cryo_manager().wear
+    if wear.version == wear_checkpoint:
+        return
+    wear_checkpoint = wear.version
+    counts = wear.snapshot()
+    state.relay_wear = ReactiveRelayWear.model_validate(counts.model_dump())
+    store.save("wear", {"wear_json": counts.model_dump_json()})
+
+
+def _persist_configuration() -> None:
+    """Persist the current title and labels; both go out in the same flush."""
+    _persist_labels()
+    _persist_settings()
+
+
+def _stash_current_configuration() -> dict[str, Any]:
+    with Session(engine) as session:
+        snapshot = record_stash(
+            session,
+            state.settings.title_label,
+            state.button_labels.model_dump(mode="json"),
+        )
+        session.commit()
+        session.refresh(snapshot)
+        stashed = snapshot_detail(snapshot)
+        if apply_retention(session, history_retention):
+            session.commit()
+        return stashed
+
+
+def _list_configuration_history() -> list[dict[str, Any]]:
+    with Session(engine) as session:
+        snapshots = session.exec(
+            select(ConfigurationSnapshot)
+            .order_by(ConfigurationSnapshot.created_at.desc())
+        ).all()
+        return [snapshot_detail(snapshot) for snapshot in snapshots]
+
+
+def _configuration_history_page(
+    limit: int, cursor: str | None, summary: bool
+) -> dict[str, Any]:
+    with Session(engine) as session:
+        return history_page(session, limit, cursor, summary)
+
+
+def _get_configuration_snapshot(snapshot_id: int) -> ConfigurationSnapshot | None:
+    with Session(engine) as session:
+        snapshot = session.get(ConfigurationSnapshot, snapshot_id)
+        if snapshot is None:
+            return None
+        # Detach the values used after the session closes.
+        return ConfigurationSnapshot.model_validate(snapshot.model_dump())
+
+
+async def _prepare_switching(verification: Verification) -> None:
+    await asyncio.to_thread(cryo_manager().prepare_switching, verification)
+
+
+async def _finish_switching(verification: Verification) -> None:
+    await asyncio.to_thread(cryo_manager().finish_switching, verification)
+
+
+class _SwitchingSession:
+    """Prepared switching hardware held open across several switch commands."""
+
+    def __init__(self, verification: Verification, idle_timeout: float):
+        self.verification = verification
+        self.idle_timeout = idle_timeout
+        self.last_used = time.monotonic()
+        self.watchdog: asyncio.Task[None] | None = None
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used
+
+
+switching_session: _SwitchingSession | None = None
+
+
+async def _close_switching_session() -> None:
+    """Restore the hardware held by the session; the caller holds the hardware lock."""
+    global switching_session
+    session = switching_session
+    if session is None:
+        return
+    switching_session = None
+    if session.watchdog is not None and session.watchdog is not asyncio.current_task():
+        session.watchdog.cancel()
+    try:
+        await _finish_switching(session.verification)
+    finally:
+        with sync.batch():
+            _checkpoint_wear()
+            _publish_metrics()
+
+
+async def _expire_switching_session(session: _SwitchingSession) -> None:
+    while switching_session is session:
+        remaining = session.idle_timeout - session.idle_seconds()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+            continue
+        async with hardware_command_lock:
+            if (
+                switching_session is session
+                and session.idle_seconds() >= session.idle_timeout
+            ):
+                logger.info("switching session idle, restoring amp and pulser")
+                await _close_switching_session()
+
+
+async def _run_plan(plan: SwitchPlan, verification: Verification) -> None:
+    """Switch in one worker-thread hop and publish the positions reached.
+
+    Amp shutoff and pulser unblocking ride along in the same hop, unless a
+    switching session already prepared the hardware (its idle timer restarts).
+    The caller holds the hardware lock.
+    """
+    session = switching_session
+    completed: list[PlannedPulse] = []
+    if session is not None:
+        session.touch()
+    try:
+        await asyncio.to_thread(
+            cryo_manager().run_switch,
+            plan,
+            verification,
+            completed,
+            session is None,
+        )
+    finally:
+        if session is not None:
+            session.touch()
+        with sync.batch():
+            for pulse in completed:
+                _relay(pulse.relay).pos = pulse.position
+            _refresh_derived_tree_state()
+            _checkpoint_wear()
+
+
+def _check_hardware_ready() -> None:
+    """Refuse to switch while the relay board or pulse generator is not up.
+
+    Until then the manager holds placeholders that fire nothing, so a switch
+    would record tree positions the hardware never reached.
+    """
+    if not cryo_manager().enabled:
+        return
+    for device in ("relay_board", "pulse_generator"):
+        status = getattr(state.hardware, device)
+        if status.status != "ready":
+            raise CommandError(
+                code="hardware_not_ready",
+                message=f"The {device.replace('_', ' ')} is not ready ({status.status}).",
+                path=f"/hardware/{device}/status",
+            )
+
+
+async def _switch(
+    verification: Verification,
+    make_plan: Callable[[], SwitchPlan],
+    persist: bool = True,
+) -> None:
+    """Plan against the current positions and fire only what the plan needs.
+
+    Planning happens under the hardware lock so it sees the positions left by
+    any earlier command. An empty plan skips amp shutoff and unblocking too.
+    The command's wall time, waiting for the lock included, goes to
+    COMMAND_SECONDS. Everything logged on the way, in the worker thread too,
+    carries one switch operation ID.
+    """
+    started = time.monotonic()
+    plan: SwitchPlan | None = None
+    with switch_operation():
+        try:
+            async with hardware_command_lock:
+                _check_hardware_ready()
+                plan = make_plan()
+                logger.info(
+                    "%s: %d pulses, %d relays already in position",
+                    plan.command,
+                    len(plan.pulses),
+                    len(plan.skipped),
+                    extra={"command": plan.command, "channel": plan.target_channel},
+                )
+                cryo_manager().count_skipped(plan)
+                if not plan.pulses:
+                    _checkpoint_wear()
+                    return
+                await _run_plan(plan, verification)
+                if persist:
+                    _persist_tree()
+        finally:
+            if plan is not None:
+                COMMAND_SECONDS.observe(plan.command, time.monotonic() - started)
+                _publish_metrics()
+
+
+def _check_channel(number: int) -> None:
+    if number < 0 or number > 7:
+        raise CommandError(
+            code="invalid_channel",
+            message="Channel must be between 0 and 7.",
+            path="/tree_state/activated_channel",
+        )
+
+
+def _plan_channel(number: int) -> SwitchPlan:
+    return channel_plan(
+        _positions(),
+        number,
+        skip_unchanged=state.settings.tree_memory_mode,
+        gap=SLEEP_TIME,
+    )
+
+
+@sync.command
+async def reset_tree(ctx: CommandContext, verification: dict[str, Any]) -> None:
+    await _switch(_verification(verification), reset_plan)
+
+
+@sync.command
+async def re_assert_tree(ctx: CommandContext, verification: dict[str, Any]) -> None:
+    await _switch(
+        _verification(verification),
+        lambda: re_assert_plan(_positions()),
+        persist=False,
+    )
+
+
+@sync.command
+async def request_channel(
+    ctx: CommandContext, number: int, verification: dict[str, Any]
+) -> dict[str, Any]:
+    """Switch to channel ``number``, unless a newer request_channel supersedes
+    this one while it waits for the one in progress (see switch_scheduler.py).
+    """
+    _check_channel(number)
+    validated = _verification(verification)
+    if not await channel_requests.turn():
+        logger.info("request_channel %d superseded", number, extra={"channel": number})
+        return {"result": "superseded", "channel": number}
+    try:
+        await _switch(validated, lambda: _plan_channel(number))
+    finally:
+        channel_requests.done()
+    return {"result": "switched", "channel": number}
+
+
+@sync.command
+async def plan_channel(ctx: CommandContext, number: int) -> dict[str, Any]:
+    """Dry run of request_channel: the pulses it would fire and the expected time."""
+    _check_channel(number)
+    plan = _plan_channel(number)
+    plan.estimated_seconds = cryo_manager().estimate_plan_seconds(
+        plan, prepared=switching_session is not None
+    )
+    return plan.model_dump(mode="json")
+
+
+@sync.command
+async def toggle_switch(
+    ctx: CommandContext, number: int, verification: dict[str, Any]
+) -> None:
+    if number < 1 or number > 7:
+        raise CommandError(
+            code="invalid_relay", message="Relay must be between 1 and 7."
+        )
+    await _switch(
+        _verification(verification), lambda: toggle_plan(_positions(), number)
+    )
+
+
+@sync.command
+async def begin_switching_session(
+    ctx: CommandContext,
+    verification: dict[str, Any],
+    idle_timeout: float | None = None,
+) -> dict[str, Any]:
+    """Turn the amp off and unblock the pulser once for a burst of switch commands.
+
+    The hardware stays prepared until end_switching_session, or until no switch
+    command has run for ``idle_timeout`` seconds. Beginning again while a session
+    is open only restarts its idle timer.
+    """
+    global switching_session
+    if idle_timeout is None:
+        idle_timeout = cryo_manager().timing.session_idle_timeout
+    if idle_timeout <= 0:
+        raise CommandError(
+            code="invalid_timeout", message="Idle timeout must be positive."
+        )
+    async with hardware_command_lock:
+        if switching_session is None:
+            validated = _verification(verification)
+            await _prepare_switching(validated)
+            session = _SwitchingSession(validated, idle_timeout)
+            session.watchdog = asyncio.create_task(_expire_switching_session(session))
+            switching_session = session
+        else:
+            switching_session.idle_timeout = idle_timeout
+            switching_session.touch()
+    return {"idle_timeout": idle_timeout}
+
+
+@sync.command
+async def end_switching_session(ctx: CommandContext) -> None:
+    """Restore the amp and block the pulser; a no-op without an open session."""
+    async with hardware_command_lock:
+        await _close_switching_session()
+
+
+@sync.command
+async def preemptive_amp_shutoff(ctx: CommandContext) -> None:
+    # Not behind channel_requests: only a switch already in progress goes first
+    async with hardware_command_lock:
+        await asyncio.to_thread(cryo_manager().turn_off_amp, True)
+
+
+@sync.command
+def get_relay_wear(ctx: CommandContext) -> dict[str, Any]:
+    """Lifetime actuation counts per relay, and the pulses tree memory mode saved."""
+    counts = cryo_manager().wear.snapshot()
+    fired = sum(counts.pulses.values())
+    skipped = sum(counts.skipped.values())
+    return {
+        **counts.model_dump(),
+        "pulses_fired": fired,
+        "pulses_skipped": skipped,
+        "skipped_fraction": skipped / (fired + skipped) if fired + skipped else 0.0,
+    }
+
+
+@sync.command(requires={"manage_access"})
+async def reset_relay_wear(ctx: CommandContext, relay: str) -> None:
+    """Zero the counts of a replaced relay: "R1".."R7" or Numato relay "0".."7"."""
+    async with hardware_command_lock:
+        try:
+            cryo_manager().wear.reset(relay)
+        except ValueError as exc:
+            raise CommandError(code="invalid_relay", message=str(exc)) from exc
+        _checkpoint_wear()
+
+
+@sync.command
+def get_metrics(ctx: CommandContext) -> dict[str, Any]:
+    """Latency histograms per hardware phase and per switch command, in seconds;
+    bucket counts are cumulative, as in Prometheus."""
+    return {
+        "buckets": list(BUCKETS),
+        "phases": PHASE_SECONDS.detail(),
+        "commands": COMMAND_SECONDS.detail(),
+    }
+
+
+@sync.command(requires={"manage_access"})
+def get_server_info(ctx: CommandContext) -> dict[str, Any]:
+    """Return every non-loopback IPv4 address that can serve the remote UI."""
+    ipaddrs: list[str] = []
+    for addresses in psutil.net_if_addrs().values():
+        for address in addresses:
+            if (
+                address.family == socket.AF_INET
+                and not address.address.startswith("127.")
+                and address.address != "0.0.0.0"
+                and address.address not in ipaddrs
+            ):
+                ipaddrs.append(address.address)
+
+    if not ipaddrs:
+        ipaddrs = ["127.0.0.1"]
+
+    return {
+        "hostname": socket.gethostname(),
+        "ipaddr": ipaddrs[0],
+        "ipaddrs": ipaddrs,
+        "port": SERVE_PORT,
+    }
+
+
+@sync.command
+async def update_settings(ctx: CommandContext, settings: dict[str, Any]) -> None:
+    validated = SettingsBase.model_validate(settings)
+    with sync.batch():
+        for key, value in validated.model_dump(mode="json").items():
+            setattr(state.settings, key, value)
+    async with hardware_command_lock:
+        await asyncio.to_thread(cryo_manager().set_pulse_amplitude, state.settings)
+    _persist_settings()
+
+
+@sync.command
+async def update_configuration(
+    ctx: CommandContext, labels: dict[str, Any], title_label: str
+) -> None:
+    validated = ButtonLabelsBase.model_validate(labels)
+    with sync.batch():
+        state.button_labels = ReactiveButtonLabels.model_validate(
+            validated.model_dump(mode="json")
+        )
+        state.settings.title_label = title_label
+    _persist_configuration()
+
+
+@sync.command
+async def stash_configuration(ctx: CommandContext) -> dict[str, Any]:
+    """Add the current title and labels to configuration history."""
+    return await asyncio.to_thread(_stash_current_configuration)
+
+
+@sync.command
+async def list_configuration_history(
+    ctx: CommandContext,
+) -> list[dict[str, Any]]:
+    """Every snapshot with its labels; the history dialog pages instead."""
+    return await asyncio.to_thread(_list_configuration_history)
+
+
+@sync.command
+async def configuration_history_page(
+    ctx: CommandContext,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    summary: bool = True,
+) -> dict[str, Any]:
+    """One page of history, newest first: ``items`` plus the ``next_cursor``
+    to pass back for the following page (None on the last one)."""
+    try:
+        return await asyncio.to_thread(
+            _configuration_history_page, limit, cursor, summary
+        )
+    except ValueError as exc:
+        raise CommandError(
+            code="invalid_cursor",
+            message="That history cursor is not valid.",
+        ) from exc
+
+
+@sync.command
+async def get_configuration(
+    ctx: CommandContext, configuration_id: int
+) -> dict[str, Any]:
+    """Title, time and labels of one stashed configuration."""
+    snapshot = await asyncio.to_thread(
+        _get_configuration_snapshot, configuration_id
+    )
+    if snapshot is None:
+        raise CommandError(
+            code="configuration_not_found",
+            message="That saved configuration no longer exists.",
+        )
+    return snapshot_detail(snapshot)
+
+
+@sync.command
+async def load_configuration(ctx: CommandContext, configuration_id: int) -> None:
+    snapshot = await asyncio.to_thread(
+        _get_configuration_snapshot, configuration_id
+    )
+    if snapshot is None:
+        raise CommandError(
+            code="configuration_not_found",
+            message="That saved configuration no longer exists.",
+        )
+
+    labels = snapshot_labels(snapshot)
+    if (
+        snapshot.title_label == state.settings.title_label
+        and labels == state.button_labels.model_dump(mode="json")
+    ):
+        return  # already the live configuration; nothing to publish or persist
+    with sync.batch():
+        state.button_labels = ReactiveButtonLabels.model_validate(labels)
+        state.settings.title_label = snapshot.title_label
+    _persist_configuration()
+
+
+@sync.command
+async def switch_pulse_generator(
+    ctx: CommandContext, kind: str, ip: str | None = None
+) -> None:
+    """Open and activate another pulse generator, and publish its readiness in
+    state.hardware, as bring-up does: switch commands follow that status."""
+    async with hardware_command_lock:
+        started = time.monotonic()
+        opening = asyncio.ensure_future(
+            asyncio.to_thread(cryo_manager().open_pulse_generator, kind, ip)
+        )
+        await asyncio.wait({opening})
+        state.settings.pulse_generator_ip = ip
+        await _adopt_device(
+            state.hardware.pulse_generator, opening, _use_pulse_generator, started
+        )
+
+
+def _load_persisted_state() -> dict[str, Any]:
+    with Session(engine) as session:
+        tree_row = session.exec(select(TreeState).where(TreeState.id == 1)).one()
+        labels = session.exec(select(ButtonLabels).where(ButtonLabels.id == 1)).one()
+        settings = session.exec(select(Settings).where(Settings.id == 1)).one()
+        wear = session.exec(select(RelayWear).where(RelayWear.id == 1)).one()
+        tree = Tree.model_validate_json(tree_row.tree_json)
+        return {
+            "tree_state": _tree_from_persisted(tree).model_dump(mode="json"),
+            "button_labels": ReactiveButtonLabels.model_validate(
+                labels.model_dump(exclude={"id"})
+            ).model_dump(mode="json"),
+            "settings": ReactiveSettings.model_validate(
+                settings.model_dump(exclude={"id"})
+            ).model_dump(mode="json"),
+            "pulse_generator": ReactivePulseGeneratorInfo().model_dump(mode="json"),
+            "relay_wear": RelayWearBase.model_validate_json(wear.wear_json).model_dump(),
+        }
+
+
+def _read_hardware_config() -> tuple[bool, bool]:
+    data = _read_system_config()
+    return bool(data.get("enabled", False)), bool(data.get("function_gen", True))
+
+
+def _read_pulse_config() -> tuple[str | None, str | None, float | None]:
+    """Per-machine pulse-generator selection from system_settings.yml.
+
+    Any value left unset falls back to the persisted DB setting (kind/ip) or the
+    code default (sleep_time). This is how a given instrument declares which
+    physical pulse generator it drives without editing shared source.
+    """
+    data = _read_system_config()
+    kind = data.get("pulse_generator_kind")
+    ip = data.get("pulse_generator_ip")
+    sleep = data.get("pulse_sleep_time")
+    return (
+        str(kind) if kind else None,
+        str(ip) if ip else None,
+        float(sleep) if sleep is not None else None,
+    )
+
+
+def _read_history_retention() -> HistoryRetention:
+    """Configuration history bounds from the ``history:`` mapping in
+    system_settings.yml."""
+    data = _read_system_config().get("history") or {}
+    return HistoryRetention.model_validate(data)
+
+
+def _read_timing_profile() -> TimingProfile:
+    """Hardware timing profile from the ``timing:`` mapping in system_settings.yml.
+
+    Unset keys keep the TimingProfile defaults, which match the historical
+    fixed sleeps.
+    """
+    data = _read_system_config().get("timing") or {}
+    return TimingProfile.model_validate(data)
+
+
+def _read_logging_settings() -> LoggingSettings:
+    """Log levels and sinks from the ``logging:`` mapping in system_settings.yml."""
+    data = _read_system_config().get("logging") or {}
+    return LoggingSettings.model_validate(data)
+
+
+async def _use_pulse_generator(
+    opened: tuple[PulseGenerator | None, ReactivePulseGeneratorInfo],
+) -> tuple[str, str | None]:
+    generator, info = opened
+    await asyncio.to_thread(cryo_manager().use_pulse_generator, generator)
+    with sync.batch():
+        state.pulse_generator = info
+        state.settings.pulse_generator_kind = info.active_kind
+    _persist_settings()
+    if generator is None:
+        return "ready", info.message
+    if not info.created or info.message:
+        return "error", info.message
+    return "ready", None
+
+
+async def _bring_up_device(
+    device: str,
+    open_device: Callable[[], Any],
+    use_device: Callable[[Any], Any],
+    discard_device: Callable[[Any], None],
+) -> None:
+    """Open one device on a worker thread and publish its readiness.
+
+    The caller holds hardware_command_lock. A device that misses its timeout is
+    reported as such and adopted, under the lock, whenever it does come up.
+    If the server shuts down first, the device is closed with
+    ``discard_device`` once it has opened.
+    """
+    status = getattr(state.hardware, device)
+    started = time.monotonic()
+    opening = asyncio.ensure_future(asyncio.to_thread(open_device))
+    try:
+        done, _ = await asyncio.wait({opening}, timeout=BRING_UP_TIMEOUTS[device])
+    except asyncio.CancelledError:
+        await _discard_device(opening, discard_device)
+        raise
+    if done:
+        await _adopt_device(status, opening, use_device, started)
+        return
+    with sync.batch():
+        status.status = "timeout"
+        status.message = f"No answer after {BRING_UP_TIMEOUTS[device]:g} s; still trying"
+        status.seconds = None
+
+    async def adopt_late() -> None:
+        adopted = False
+        try:
+            await asyncio.wait({opening})
+            async with hardware_command_lock:
+                if services is not None:
+                    adopted = True
+                    await _adopt_device(status, opening, use_device, started)
+        finally:
+            # cleanup() only reaches the devices the manager holds
+            if not adopted:
+                await _discard_device(opening, discard_device)
+
+    task = asyncio.create_task(adopt_late())
+    late_adoptions.add(task)
+    task.add_done_callback(late_adoptions.discard)
+
+
+async def _discard_device(
+    opening: asyncio.Future, discard_device: Callable[[Any], None]
+) -> None:
+    await asyncio.wait({opening})
+    if opening.cancelled() or opening.exception() is not None:
+        return
+    try:
+        await asyncio.to_thread(discard_device, opening.result())
+    except Exception as exc:
+        logger.warning("Failed to close a device opened after shutdown: %s", exc)
+
+
+async def _adopt_device(
+    status: ReactiveDeviceStatus,
+    opening: asyncio.Future,
+    use_device: Callable[[Any], Any],
+    started: float,
+) -> None:
+    """Make an opened device current and publish ``(status, message)`` from
+    ``use_device``, which may be a coroutine function."""
+    try:
+        outcome = use_device(opening.result())
+        if asyncio.iscoroutine(outcome):
+            outcome = await outcome
+    except Exception as exc:
+        outcome = ("error", str(exc))
+    with sync.batch():
+        status.status, status.message = outcome
+        status.seconds = round(time.monotonic() - started, 3)
+
+
+async def _bring_up_hardware(manager: CryoRelayManager) -> None:
+    """Open the relay board, pulse generator and amp supply concurrently.
+
+    Called with hardware_command_lock already held, so hardware commands wait
+    until every device is up or has timed out; the UI is served meanwhile.
+    """
+    kind = state.settings.pulse_generator_kind
+    ip = state.settings.pulse_generator_ip
+    try:
+        await asyncio.gather(
+            _bring_up_device(
+                "relay_board",
+                manager.open_relay_board,
+                manager.use_relay_board,
+                manager.discard_relay_board,
+            ),
+            _bring_up_device(
+                "pulse_generator",
+                lambda: manager.open_pulse_generator(kind, ip),
+                _use_pulse_generator,
+                manager.discard_pulse_generator,
+            ),
+            _bring_up_device(
+                "power_supply",
+                manager.connect_amp,
+                manager.use_amp,
+                manager.discard_amp,
+            ),
+        )
+    finally:
+        hardware_command_lock.release()
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    global services, history_retention, wear_checkpoint
+    configure_logging(_read_logging_settings())
+    logger.info("Creating database and loading authoritative state...")
+    create_db_and_tables()
+    sync.load_state(_load_persisted_state())
+    store.start()
+    history_retention = _read_history_retention()
+    enabled, function_gen = _read_hardware_config()
+    pulse_kind, pulse_ip, pulse_sleep_time = _read_pulse_config()
+    # The machine's yaml, when it names a generator, overrides the persisted
+    # DB setting so a fresh install boots straight onto this instrument's hardware.
+    if pulse_kind is not None:
+        state.settings.pulse_generator_kind = pulse_kind
+        state.settings.pulse_generator_ip = pulse_ip
+    services = await asyncio.to_thread(
+        CryoRelayManager,
+        enabled,
+        function_gen,
+        pulse_sleep_time,
+        _read_timing_profile(),
+        SwitchJournal(),
+    )
+    services.wear.load(RelayWearBase.model_validate(state.relay_wear.model_dump()))
+    wear_checkpoint = services.wear.version
+    bring_up: asyncio.Task | None = None
+    try:
+        services.set_pulse_amplitude(state.settings)
+        _refresh_derived_tree_state()
+        # Taken here rather than in the task so no command can slip in first
+        await hardware_command_lock.acquire()
+        bring_up = asyncio.create_task(_bring_up_hardware(services))
+        async with sync.lifespan(app):
+            yield
+    finally:
+        # waits for devices still opening, so they can be closed
+        pending = [*late_adoptions, *([bring_up] if bring_up is not None else [])]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if switching_session is not None:
+            try:
+                async with hardware_command_lock:
+                    await _close_switching_session()
+            except Exception as exc:
+                logger.error("Failed to close switching session: %s", exc)
+        if services is not None:
+            await asyncio.to_thread(services.cleanup)
+            if services.journal is not None:
+                services.journal.close()
+        services = None
+        await asyncio.to_thread(store.close)
+        stop_logging()
+
+
+mimetypes.init()
+
+
+def _login_page(error: str = "") -> HTMLResponse:
+    error_markup = (
+        f'<p class="error" role="alert">{html.escape(error)}</p>' if error else ""
+    )
+    document = """<!doctype html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+  <title>Switch Control — Remote Access</title>
+  <style>
+    :root { font-family: Arial, Helvetica, sans-serif; color: #18181b; background: #fbfbfb; }
+    body { min-height: 100vh; margin: 0; display: grid; place-items: center; padding: 1rem; box-sizing: border-box; }
+    main { width: min(100%, 22rem); background: white; border: 1px solid #e5e7eb; border-radius: .55rem; box-shadow: 0 10px 30px rgba(0,0,0,.08); padding: 1.25rem; }
+    h1 { margin: 0 0 .45rem; font-size: 1.2rem; }
+    p { color: #6b7280; font-size: .86rem; line-height: 1.4; }
+    label { display: block; margin: 1rem 0 .35rem; font-size: .82rem; font-weight: 600; }
+    input[type=password] { box-sizing: border-box; width: 100%; padding: .62rem .7rem; border: 1.5px solid #dfe2e9; border-radius: .3rem; font: inherit; letter-spacing: .04em; }
+    .remember { display: flex; align-items: center; gap: .45rem; margin: .75rem 0 0; font-weight: 400; }
+    .remember input { margin: 0; }
+    button { width: 100%; margin-top: .7rem; padding: .62rem; border: 1.5px solid #534deb; border-radius: .3rem; background: #534deb; color: white; font: inherit; cursor: pointer; }
+    .error { color: #b42318; background: #fff1f0; border-radius: .3rem; padding: .5rem .6rem; }
+    .note { margin-bottom: 0; font-size: .75rem; }
+  </style>
+</head>
+<body>
+  <main>
+    <h1>Switch Control</h1>
+    <p>Enter the persistent master passphrase configured on the instrument.</p>
+    __ERROR__
+    <form id="login" action="/sync/auth/login" method="post">
+      <label for="passphrase">Access passphrase</label>
+      <input id="passphrase" name="passphrase" type="password" autocomplete="current-password" required autofocus />
+      <label class="remember"><input id="remember" type="checkbox" checked /> Remember this device for 30 days</label>
+      <button type="submit">Open Switch Control</button>
+    </form>
+    <p class="note">Use only on a trusted network. This local HTTP connection is not encrypted.</p>
+  </main>
+  <script>
+    const form = document.getElementById("login");
+    const error = document.querySelector(".error") || document.createElement("p");
+    error.className = "error";
+    error.setAttribute("role", "alert");
+
+    function message(code) {
+      if (code === "invalid_credentials") return "That passphrase was not accepted.";
+      if (code === "invalid_or_expired_invite") return "This access link has expired or has already been used.";
+      if (code === "rate_limited") return "Too many attempts. Wait one minute and try again.";
+      if (code === "setup_required") return "Remote access must first be configured on the instrument computer.";
+      if (code === "origin_not_allowed") return "This address is not permitted to authenticate with the instrument.";
+      return "Remote access could not be authenticated.";
+    }
+
+    async function authenticate(path, body) {
+      const response = await fetch(path, {
+        method: "POST",
+        credentials: "include",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(body),
+      });
+      const result = await response.json().catch(() => ({}));
+      if (!response.ok) throw new Error(message(result.error));
+      location.replace(location.pathname);
+    }
+
+    form.addEventListener("submit", (event) => {
+      event.preventDefault();
+      authenticate("/sync/auth/login", {
+        passphrase: document.getElementById("passphrase").value,
+        remember: document.getElementById("remember").checked,
+        deviceName: navigator.userAgent.includes("Mobile") ? "Mobile browser" : "Web browser",
+      }).catch((cause) => {
+        error.textContent = cause.message;
+        form.before(error);
+      });
+    });
+
+    const invite = new URLSearchParams(location.hash.slice(1)).get("invite");
+    if (invite) {
+      history.replaceState(null, "", location.pathname + location.search);
+      authenticate("/sync/auth/invite", {
+        invite,
+        remember: true,
+        deviceName: navigator.userAgent.includes("Mobile") ? "Mobile browser" : "Web browser",
+      }).catch((cause) => {
+        error.textContent = cause.message;
+        form.before(error);
+      });
+    }
+  </script>
+</body>
+</html>""".replace("__ERROR__", error_markup)
+    return HTMLResponse(
+        document,
+        headers={
+            "Cache-Control": "no-store",
+            "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; script-src 'unsafe-inline'; connect-src 'self'; form-action 'self'; base-uri 'none'; frame-ancestors 'none'",
+            "Referrer-Policy": "no-referrer",
+        },
+    )
+
+
+async def return_index(request: Request):
+    mimetypes.add_type("application/javascript", ".js")
+    if not remote_access.is_http_authorized(request):
+        return _login_page()
+    return FileResponse(Path(WEB_DIR, "index.html"))
+
+
+async def prometheus_metrics(request: Request):
+    if not remote_access.is_http_authorized(request):
+        return PlainTextResponse("Authentication required\n", status_code=401)
+    return PlainTextResponse(
+        prometheus_text(), media_type="text/plain; version=0.0.4"
+    )
+
+
+routes = [*sync.routes, Route("/metrics", prometheus_metrics)]
+web_path = Path(WEB_DIR)
+if web_path.exists():
+    routes.extend(
+        [
+            Mount("/assets", StaticFiles(directory=web_path / "assets"), name="assets"),
+            Route("/", return_index),
+        ]
+    )
+
+app = Starlette(routes=routes, lifespan=lifespan)
+
+
+class ParentControlledServer(Server):
+    @contextmanager
+    def capture_signals(self):
+        # Signals for this application are coordinated by the parent process.
+        # Uvicorn's default handler would independently shut this child down
+        # when Ctrl-C is delivered to the whole foreground process group.
+        yield
@@ -0,0 +1,48 @@
+class ShadowRegisters:
+    """
+    Write-through cache of the settings last sent to an instrument.
+
+    Mix in ahead of visaInst. Setters check ``_holds`` before writing and call
+    ``_remember`` once the write succeeded, so a repeated setting (the same
+    amplitude, offset and polarity for seven flip_left calls in a row) costs no
+    SCPI traffic. The cache is keyed by (channel, setting) and is cleared on
+    connect and on any *RST, after which every setting is sent again.
+
+    Settings changed behind the driver's back (front panel, another program on
+    a direct VISA connection) are not seen; call invalidate_settings() then.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._shadow: dict[tuple[int, str], object] = {}
+
+    def connect(self):
+        self.invalidate_settings()
+        return super().connect()
+
+    def write(self, cmd: str):
+        if "*RST" in cmd.upper():
+            self.invalidate_settings()
+        return super().write(cmd)
+
+    def invalidate_settings(self, channel: int | None = None):
+        """Forget cached settings for one channel, or for all channels."""
+        if channel is None:
+            self._shadow.clear()
+            return
+        for key in [key for key in self._shadow if key[0] == channel]:
+            del self._shadow[key]
+
+    def _holds(self, channel: int, setting: str, value: object) -> bool:
+        """True when the instrument is known to already hold ``value``."""
+        return self._shadow.get((channel, setting), _UNKNOWN) == value
+
+    def _forget(self, channel: int, *settings: str):
+        for setting in settings:
+            self._shadow.pop((channel, setting), None)
+
+    def _remember(self, channel: int, setting: str, value: object):
+        self._shadow[(channel, setting)] = value
+
+
+_UNKNOWN = object()
@@ -0,0 +1,68 @@
+"""
+Simulated lab hardware, for running the backend on any Linux machine.
+
+- SimulatedNumato: the relay board, on a pseudo-terminal.
+- SimulatedInstrumentServer: the instrument server, with a function generator
+  and an E36312A amp supply behind the ``client_*`` JSON protocol.
+- SimulationProfile: latencies and fault rates for both.
+
+start_simulation() starts everything; ``python -m simulator`` does the same
+from the command line and prints how to point the backend at it.
+"""
+
+from simulator.instruments import (
+    SimulatedFunctionGenerator,
+    SimulatedInstrumentServer,
+    SimulatedPowerSupply,
+    start_instrument_server,
+)
+from simulator.numato import SimulatedNumato
+from simulator.profile import FaultInjector, Latency, SimulationProfile
+
+
+class Simulation:
+    """A running relay board and instrument server sharing one profile."""
+
+    def __init__(self, profile: SimulationProfile | None = None, port: int = 0):
+        self.profile = profile if profile is not None else SimulationProfile()
+        self.faults = FaultInjector(self.profile)
+        self.relay_board = SimulatedNumato(self.profile, self.faults).start()
+        self.instruments = start_instrument_server(port, self.profile, self.faults)
+
+    @property
+    def relay_port(self) -> str:
+        return self.relay_board.port
+
+    @property
+    def instrument_port(self) -> int:
+        return self.instruments.server_address[1]
+
+    def close(self):
+        self.instruments.shutdown()
+        self.instruments.server_close()
+        self.relay_board.close()
+
+    def __enter__(self) -> "Simulation":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def start_simulation(profile: SimulationProfile | None = None, port: int = 0) -> Simulation:
+    """Start the simulated hardware; port 0 picks a free port for the instruments."""
+    return Simulation(profile, port)
+
+
+__all__ = [
+    "FaultInjector",
+    "Latency",
+    "Simulation",
+    "SimulationProfile",
+    "SimulatedFunctionGenerator",
+    "SimulatedInstrumentServer",
+    "SimulatedNumato",
+    "SimulatedPowerSupply",
+    "start_instrument_server",
+    "start_simulation",
+]
@@ -0,0 +1,52 @@
+"""
+Run the simulated relay board and instrument server until Ctrl-C:
+
+    cd backend/backend
+    python -m simulator --profile simulation.yml --port 8888
+"""
+
+import argparse
+import time
+
+import yaml
+
+from simulator import SimulationProfile, start_simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated switch_control hardware")
+    parser.add_argument("--port", type=int, default=8888, help="instrument server port")
+    parser.add_argument("--profile", help="YAML file of SimulationProfile fields")
+    parser.add_argument("--seed", type=int, help="seed for latencies and faults")
+    parser.add_argument(
+        "--fault-rate",
+        type=float,
+        help="probability of a server error per instrument request",
+    )
+    args = parser.parse_args()
+
+    data = {}
+    if args.profile:
+        with open(args.profile, "r") as file:
+            data = yaml.safe_load(file) or {}
+    profile = SimulationProfile.model_validate(data)
+    if args.seed is not None:
+        profile.seed = args.seed
+    if args.fault_rate is not None:
+        profile.instrument_error_rate = args.fault_rate
+
+    with start_simulation(profile, args.port) as simulation:
+        print(f"Simulated Numato relay board on {simulation.relay_port}")
+        print(f"Simulated instrument server on localhost:{simulation.instrument_port}")
+        print("Point the backend at it with")
+        print(f"    NUMATO_RELAY_PORT={simulation.relay_port} python main.py")
+        print("and, in system_settings.yml, enabled: true and pulse_generator_kind: client")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
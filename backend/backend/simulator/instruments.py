@@ -0,0 +1,101 @@
+"""
+The instrument server, with instruments that take time and fail on demand.
+
+Builds on instrument_stand_in.py: the framing, the method set and the
+recorded calls are the stand-in's. On top of that a pulse takes as long as
+the profile says, the E36312A output discharges over ``amp_discharge``
+after OUTP OFF instead of reading 0 V at once, every reply is delayed by
+the network round trip, and replies can be turned into server errors,
+stalls or dropped connections.
+"""
+
+import threading
+import time
+
+from instrument_stand_in import StandInFunctionGenerator, StandInPowerSupply, StandInServer
+from simulator.profile import FaultInjector, SimulationProfile
+
+
+class SimulatedFunctionGenerator(StandInFunctionGenerator):
+    def __init__(self, profile: SimulationProfile, faults: FaultInjector):
+        super().__init__()
+        self.profile = profile
+        self.faults = faults
+        self.pulses: list[tuple[float, float, str]] = []  # (time, amplitude, polarity)
+
+    def call(self, method: str, args: list, kwargs: dict):
+        result = super().call(method, args, kwargs)
+        if method == "fire_pulse":
+            time.sleep(self.faults.latency(self.profile.fire_pulse))
+        elif method == "trigger_with_polarity":
+            time.sleep(self.profile.trigger_settle)
+        if method in ("fire_pulse", "trigger_with_polarity"):
+            _, amplitude, polarity = args
+            self.pulses.append((time.time(), amplitude, polarity))
+        return result
+
+
+class SimulatedPowerSupply(StandInPowerSupply):
+    """E36312A whose output falls linearly to 0 V over ``amp_discharge``."""
+
+    def __init__(self, profile: SimulationProfile):
+        super().__init__(profile.amp_voltage)
+        self.profile = profile
+        self.on = {channel: True for channel in profile.amp_outputs_on}
+        self._off_at: dict[int, float] = {}
+
+    def call(self, method: str, args: list, kwargs: dict):
+        if method == "output_off" and self.on.get(args[0], False):
+            self._off_at[args[0]] = time.monotonic()
+        elif method == "output_on":
+            self._off_at.pop(args[0], None)
+        if method == "getVoltage" and args[0] in self._off_at:
+            discharge = self.profile.amp_discharge
+            elapsed = time.monotonic() - self._off_at[args[0]]
+            if discharge > 0 and elapsed < discharge:
+                return self.voltage * (1 - elapsed / discharge)
+        return super().call(method, args, kwargs)
+
+
+class SimulatedInstrumentServer(StandInServer):
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 8888,
+        profile: SimulationProfile | None = None,
+        faults: FaultInjector | None = None,
+    ):
+        super().__init__(host, port)
+        self.profile = profile if profile is not None else SimulationProfile()
+        self.faults = faults if faults is not None else FaultInjector(self.profile)
+        self.function_gen = SimulatedFunctionGenerator(self.profile, self.faults)
+        self.power_supply = SimulatedPowerSupply(self.profile)
+        self.faults_injected: dict[str, int] = {"error": 0, "stall": 0, "disconnect": 0}
+
+    def dispatch(self, request: dict) -> dict:
+        profile = self.profile
+        time.sleep(self.faults.latency(profile.instrument_reply))
+        if self.faults.fault(profile.instrument_disconnect_rate):
+            self.faults_injected["disconnect"] += 1
+            raise ConnectionAbortedError("simulated connection drop")
+        if self.faults.fault(profile.instrument_stall_rate):
+            self.faults_injected["stall"] += 1
+            time.sleep(profile.instrument_stall)
+        if self.faults.fault(profile.instrument_error_rate):
+            self.faults_injected["error"] += 1
+            reply = {"error": "simulated instrument fault"}
+            if "id" in request:
+                reply["id"] = request["id"]
+            return reply
+        return super().dispatch(request)
+
+
+def start_instrument_server(
+    port: int = 0,
+    profile: SimulationProfile | None = None,
+    faults: FaultInjector | None = None,
+) -> SimulatedInstrumentServer:
+    """Serve on a background thread; port 0 picks a free port (see server_address)."""
+    server = SimulatedInstrumentServer(port=port, profile=profile, faults=faults)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,128 @@
+"""
+A Numato 8-channel USB relay board behind a pseudo-terminal.
+
+The board's side of the pty is served from a thread that answers the commands
+numatoRelay.Relay sends, the way the firmware does: every command is echoed,
+followed by its reply, if it has one, and the ``>`` prompt. Only ``ver``,
+``reset`` and ``relay on|off|read|readall|writeall`` are understood; anything
+else gets just the prompt. Open ``port`` with Relay, or point the backend at
+it through NUMATO_RELAY_PORT.
+"""
+
+import os
+import pty
+import select
+import threading
+import time
+import tty
+
+from simulator.profile import FaultInjector, SimulationProfile
+
+
+class SimulatedNumato:
+    relay_count = 8
+
+    def __init__(
+        self,
+        profile: SimulationProfile | None = None,
+        faults: FaultInjector | None = None,
+    ):
+        self.profile = profile if profile is not None else SimulationProfile()
+        self.faults = faults if faults is not None else FaultInjector(self.profile)
+        self.mask = 0  # bit n set: relay n is on
+        self.transitions = [0] * self.relay_count  # on/off changes per relay
+        self.commands: list[str] = []
+        self.dropped = 0
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="numato-sim", daemon=True)
+
+    def start(self) -> "SimulatedNumato":
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed.set()
+        self._thread.join(1.0)
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self) -> "SimulatedNumato":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_on(self, relay: int) -> bool:
+        return bool(self.mask >> relay & 1)
+
+    def _run(self):
+        buffer = b""
+        while not self._closed.is_set():
+            try:
+                readable, _, _ = select.select([self._master], [], [], 0.1)
+                if not readable:
+                    continue
+                buffer += os.read(self._master, 1024)
+            except OSError:
+                return
+            # Relay ends commands with "\n\r"; either character ends a line
+            *lines, buffer = buffer.replace(b"\r", b"\n").split(b"\n")
+            for line in lines:
+                command = line.decode(errors="replace").strip()
+                if command:
+                    self._answer(command)
+
+    def _answer(self, command: str):
+        self.commands.append(command)
+        time.sleep(self.faults.latency(self.profile.relay_command))
+        if self.faults.fault(self.profile.relay_drop_rate):
+            self.dropped += 1
+            return
+        try:
+            reply = self.execute(command)
+        except ValueError:  # a relay number or mask that does not parse
+            reply = None
+        output = command + "\n\r" + (reply + "\n\r" if reply is not None else "") + ">"
+        try:
+            os.write(self._master, output.encode())
+        except OSError:
+            pass
+
+    def execute(self, command: str) -> str | None:
+        """Apply ``command`` to the relays; the reply text, or None."""
+        words = command.split()
+        if words == ["ver"]:
+            return self.profile.relay_version
+        if words == ["reset"]:
+            self._set(0)
+            return None
+        if len(words) < 2 or words[0] != "relay":
+            return None
+        action, arguments = words[1], words[2:]
+        if action == "readall":
+            return f"{self.mask:0{self.relay_count // 4}x}"
+        if action == "writeall" and arguments and self.profile.relay_writeall:
+            self._set(int(arguments[0], 16) & ((1 << self.relay_count) - 1))
+            return None
+        if action not in ("on", "off", "read") or not arguments:
+            return None
+        relay = int(arguments[0], 36)  # Relay.get_channel writes 10+ as A, B, ...
+        if relay >= self.relay_count:
+            return None
+        if action == "read":
+            return "on" if self.is_on(relay) else "off"
+        bit = 1 << relay
+        self._set(self.mask | bit if action == "on" else self.mask & ~bit)
+        return None
+
+    def _set(self, mask: int):
+        changed, self.mask = self.mask ^ mask, mask
+        for relay in range(self.relay_count):
+            if changed >> relay & 1:
+                self.transitions[relay] += 1
@@ -0,0 +1,60 @@
+"""
+Latency and fault-injection knobs shared by the simulated devices.
+
+Every time is in seconds. Latencies are drawn uniformly from
+``mean +/- jitter`` and faults fire with the given probability per command, from
+one seeded random generator, so a run with a fixed ``seed`` is reproducible.
+"""
+
+import random
+import threading
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class Latency(BaseModel):
+    mean: float = 0.0
+    jitter: float = 0.0
+
+
+class SimulationProfile(BaseModel):
+    seed: Optional[int] = None
+
+    # Numato relay board
+    relay_version: str = "A0M00008"  # answer to 'ver'; must contain A0M
+    relay_command: Latency = Latency(mean=0.002, jitter=0.001)
+    relay_writeall: bool = True  # firmware understands 'relay writeall'
+    relay_drop_rate: float = 0.0  # command swallowed: no echo, no prompt
+
+    # Instrument server (function generator and E36312A)
+    instrument_reply: Latency = Latency(mean=0.002, jitter=0.001)  # network round trip
+    fire_pulse: Latency = Latency(mean=0.020, jitter=0.005)  # one fire_pulse program
+    trigger_settle: float = 0.5  # legacy trigger_with_polarity
+    amp_discharge: float = 0.3  # OUTP OFF -> output reads 0 V
+    amp_voltage: float = 5.0
+    amp_outputs_on: list[int] = [1, 2, 3]
+    instrument_error_rate: float = 0.0  # server answers with an error
+    instrument_stall_rate: float = 0.0  # reply held back for instrument_stall
+    instrument_stall: float = 6.0  # longer than the clients' 5 s timeout
+    instrument_disconnect_rate: float = 0.0  # server drops the connection instead
+
+
+class FaultInjector:
+    """Draws latencies and faults for a SimulationProfile, thread-safely."""
+
+    def __init__(self, profile: SimulationProfile):
+        self.profile = profile
+        self._random = random.Random(profile.seed)
+        self._lock = threading.Lock()
+
+    def latency(self, latency: Latency) -> float:
+        with self._lock:
+            jitter = self._random.uniform(-latency.jitter, latency.jitter)
+        return max(0.0, latency.mean + jitter)
+
+    def fault(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
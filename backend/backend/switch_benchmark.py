@@ -0,0 +1,325 @@
+"""
+End-to-end latency benchmark of the switch commands, against simulated hardware.
+
+Starts the simulator (simulator/), runs the server in this process with the
+hardware enabled, and sends request_channel, toggle_switch, reset_tree and
+re_assert_tree over a lab-link WebSocket, as the UI does. A command's wall
+time runs from sending it until both its acknowledgement and its state patch
+have arrived. The harness breaks that time into phases by wrapping the
+methods that perform each one:
+
+    amp_off      AmpProtector.turn_off_amp
+    unblock      unblock_pulser
+    wire_switch  routing relays plus the wire settle, summed over the pulses
+    trigger      fire_pulse on the generator, summed over the pulses
+    persist      handing rows to the write-behind store
+    publish      from the end of the switch until the state patch arrives
+
+Results are p50/p95/p99 per command and phase. Save them as a baseline and
+compare a later run against it:
+
+    python switch_benchmark.py --iterations 20 --save baseline.json
+    python switch_benchmark.py --compare baseline.json
+
+The backend's instrument clients always dial localhost:8888, so that port
+must be free. The database and journal go to a temporary directory.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable
+import uuid
+
+import yaml
+
+from simulator import Latency, SimulationProfile, start_simulation
+
+INSTRUMENT_PORT = 8888
+PHASES = ("amp_off", "unblock", "wire_switch", "trigger", "persist", "publish")
+COMMANDS = ("request_channel", "toggle_switch", "reset_tree", "re_assert_tree")
+VERIFICATION = {"verified": True, "timestamp": 0, "userConfirmed": True}
+# A command whose patch has not arrived by then is counted without it
+PATCH_TIMEOUT = 2.0
+
+
+class PhaseClock:
+    """Seconds spent in each phase of the command being measured."""
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.switched_at: float | None = None
+
+    def reset(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.switched_at = None
+
+    def wrap(self, phase: str, function: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.phases[phase] += time.perf_counter() - started
+
+        return timed
+
+
+def instrument(server, clock: PhaseClock):
+    """Wrap the phase methods of the running server's hardware and store."""
+    manager = server.cryo_manager()
+    controller = manager._pulse_controller
+    amp = manager._amp_protector
+    amp.turn_off_amp = clock.wrap("amp_off", amp.turn_off_amp)
+    controller.unblock_pulser = clock.wrap("unblock", controller.unblock_pulser)
+    controller._route = clock.wrap("wire_switch", controller._route)
+    controller.fg.fire_pulse = clock.wrap("trigger", controller.fg.fire_pulse)
+    server.store.save = clock.wrap("persist", server.store.save)
+
+    run_plan = server._run_plan
+
+    async def timed_run_plan(*args, **kwargs):
+        try:
+            return await run_plan(*args, **kwargs)
+        finally:
+            clock.switched_at = time.perf_counter()
+
+    server._run_plan = timed_run_plan
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {"p50": value, "p95": value, "p99": value, "mean": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50": cuts[49],
+        "p95": cuts[94],
+        "p99": cuts[98],
+        "mean": statistics.mean(samples),
+    }
+
+
+def _command_params(command: str, i: int, rng: random.Random) -> dict[str, Any]:
+    if command == "request_channel":
+        return {"number": rng.randrange(8), "verification": VERIFICATION}
+    if command == "toggle_switch":
+        return {"number": 1 + i % 7, "verification": VERIFICATION}
+    return {"verification": VERIFICATION}
+
+
+async def measure(
+    client, clock: PhaseClock, command: str, params: dict[str, Any], patches: dict[str, float]
+) -> dict[str, float]:
+    clock.reset()
+    request_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    await client.send_command(command, params, request_id=request_id, timeout=60)
+    acked = time.perf_counter()
+    deadline = acked + PATCH_TIMEOUT
+    while request_id not in patches and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+    patched = patches.pop(request_id, acked)
+    sample = dict(clock.phases)
+    if clock.switched_at is not None:
+        sample["publish"] = max(0.0, patched - clock.switched_at)
+    sample["wall"] = max(acked, patched) - started
+    return sample
+
+
+async def run_commands(
+    port: int, clock: PhaseClock, iterations: int, seed: int, tree_memory: bool
+) -> dict:
+    from lab_link.client import AsyncLabLinkClient
+
+    patches: dict[str, float] = {}
+    rng = random.Random(seed)
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    async with AsyncLabLinkClient(f"ws://127.0.0.1:{port}/sync/ws") as client:
+        client.on_patch(
+            lambda event: patches.__setitem__(event.request_id, time.perf_counter())
+            if event.request_id
+            else None
+        )
+        settings = (await client.snapshot_async() or {}).get("settings", {})
+        await client.send_command(
+            "update_settings", {"settings": {**settings, "tree_memory_mode": tree_memory}}
+        )
+        for command in COMMANDS:
+            samples: dict[str, list[float]] = {phase: [] for phase in ("wall", *PHASES)}
+            for i in range(iterations):
+                sample = await measure(
+                    client, clock, command, _command_params(command, i, rng), patches
+                )
+                for phase, seconds in sample.items():
+                    samples[phase].append(seconds)
+            results[command] = {phase: percentiles(values) for phase, values in samples.items()}
+            print(f"  {command}: p50 {results[command]['wall']['p50'] * 1e3:.1f} ms")
+    return results
+
+
+def _port_free(port: int) -> bool:
+    with socket.socket() as sock:
+        return sock.connect_ex(("127.0.0.1", port)) != 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_hardware(server, timeout: float = 30.0):
+    hardware = server.state.hardware
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        statuses = [
+            hardware.relay_board.status,
+            hardware.pulse_generator.status,
+            hardware.power_supply.status,
+        ]
+        if "pending" not in statuses:
+            if statuses != ["ready"] * 3:
+                raise RuntimeError(f"simulated hardware did not come up: {statuses}")
+            return
+        time.sleep(0.05)
+    raise RuntimeError("simulated hardware did not come up in time")
+
+
+def benchmark(
+    profile: SimulationProfile,
+    settings: dict[str, Any],
+    iterations: int,
+    tree_memory: bool,
+) -> dict:
+    if not _port_free(INSTRUMENT_PORT):
+        raise SystemExit(f"port {INSTRUMENT_PORT} is in use; stop the instrument server first")
+    with tempfile.TemporaryDirectory() as directory, start_simulation(
+        profile, INSTRUMENT_PORT
+    ) as simulation:
+        settings_path = Path(directory, "system_settings.yml")
+        settings_path.write_text(
+            yaml.safe_dump(
+                {
+                    "logging": {"console_level": "WARNING"},  # keep the report readable
+                    **settings,
+                    "enabled": True,
+                    "function_gen": True,
+                    "pulse_generator_kind": "client",
+                }
+            )
+        )
+        os.environ["SWITCH_CONTROL_SETTINGS"] = str(settings_path)
+        os.environ["NUMATO_RELAY_PORT"] = simulation.relay_port
+        workdir = os.getcwd()
+        os.chdir(directory)  # database, auth store and journal are throwaway
+        from uvicorn import Config
+
+        import server
+
+        port = _free_port()
+        uvicorn_server = server.ParentControlledServer(
+            config=Config(server.app, host="127.0.0.1", port=port, log_level="warning")
+        )
+        thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+        thread.start()
+        try:
+            while not uvicorn_server.started:
+                time.sleep(0.01)
+            _wait_for_hardware(server)
+            clock = PhaseClock()
+            instrument(server, clock)
+            print(f"{iterations} iterations per command")
+            commands = asyncio.run(
+                run_commands(port, clock, iterations, profile.seed or 0, tree_memory)
+            )
+        finally:
+            uvicorn_server.should_exit = True
+            thread.join(30)
+            os.chdir(workdir)
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "iterations": iterations,
+            "tree_memory_mode": tree_memory,
+            "profile": profile.model_dump(),
+            "timing": settings.get("timing") or {},
+        },
+        "commands": commands,
+    }
+
+
+def report(results: dict, baseline: dict | None = None):
+    header = f"{'':28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    if baseline is not None:
+        header += f"{'p50 vs base':>14}"
+    for command, phases in results["commands"].items():
+        print(f"\n{command}")
+        print(header)
+        for phase in ("wall", *PHASES):
+            stats = phases[phase]
+            line = f"  {phase:26}" + "".join(
+                f"{stats[key] * 1e3:10.1f}" for key in ("p50", "p95", "p99")
+            )
+            base = (baseline or {}).get("commands", {}).get(command, {}).get(phase)
+            if base is not None:
+                if base["p50"] > 0:
+                    line += f"{(stats['p50'] / base['p50'] - 1) * 100:+13.1f}%"
+                else:
+                    line += f"{(stats['p50'] - base['p50']) * 1e3:+12.1f}ms"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tree-memory", action="store_true", help="skip relays in position")
+    parser.add_argument("--profile", help="YAML file of SimulationProfile fields")
+    parser.add_argument("--settings", help="system_settings.yml to take the timing from")
+    parser.add_argument("--relay-latency", type=float, help="Numato reply latency (s)")
+    parser.add_argument("--instrument-latency", type=float, help="server round trip (s)")
+    parser.add_argument("--pulse", type=float, help="duration of one fire_pulse (s)")
+    parser.add_argument("--amp-discharge", type=float, help="amp OUTP OFF -> 0 V (s)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    args = parser.parse_args()
+
+    data: dict[str, Any] = {}
+    if args.profile:
+        data = yaml.safe_load(Path(args.profile).read_text()) or {}
+    profile = SimulationProfile.model_validate({"seed": args.seed, **data})
+    if args.relay_latency is not None:
+        profile.relay_command = Latency(mean=args.relay_latency)
+    if args.instrument_latency is not None:
+        profile.instrument_reply = Latency(mean=args.instrument_latency)
+    if args.pulse is not None:
+        profile.fire_pulse = Latency(mean=args.pulse)
+    if args.amp_discharge is not None:
+        profile.amp_discharge = args.amp_discharge
+    settings: dict[str, Any] = {}
+    if args.settings:
+        settings = yaml.safe_load(Path(args.settings).read_text()) or {}
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+
+    # Resolve output paths before the benchmark moves to its temporary directory
+    save = Path(args.save).resolve() if args.save else None
+    results = benchmark(profile, settings, args.iterations, args.tree_memory)
+    report(results, baseline)
+    if save is not None:
+        save.write_text(json.dumps(results, indent=2))
+        print(f"\nSaved to {save}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
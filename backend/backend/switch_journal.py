@@ -0,0 +1,251 @@
+"""
+Append-only journal of every relay pulse, in fixed-size binary records.
+
+Records are written into a memory-mapped, preallocated segment file, so
+journaling a pulse is a struct.pack_into into the page cache: no syscall, no
+SQL, nothing on the hot path that waits for the disk. The data survives a
+crash of the process (the kernel owns the pages); segments are flushed to disk
+when they fill up and on close. When a segment is full the journal rotates to
+a new one and drops the oldest beyond ``max_segments``.
+
+read_journal() streams the records back across all segments, oldest first:
+
+    python switch_journal.py switch_journal --summary
+"""
+
+import argparse
+from collections import Counter
+import mmap
+import os
+from pathlib import Path
+import statistics
+import struct
+import threading
+from typing import Iterable, Iterator, NamedTuple
+
+JOURNAL_DIR = "switch_journal"
+SEGMENT_BYTES = 1 << 20  # about 21,800 records per segment
+MAX_SEGMENTS = 16
+
+MAGIC = b"SWJ1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")  # magic, version, record size, reserved
+# seq, command, channel, relay, polarity, position, outcome, prepared,
+# amplitude, t_prepare, t_pulse, t_finish
+RECORD = struct.Struct("<QBbBbBBBxf4xddd")
+
+COMMANDS = ("unknown", "request_channel", "toggle_switch", "reset_tree", "re_assert_tree")
+OUTCOMES = ("ok", "failed", "not_fired")
+
+
+class JournalRecord(NamedTuple):
+    seq: int
+    command: str
+    channel: int | None  # target channel of request_channel
+    relay: int  # 1..7
+    polarity: int  # +1 POS (flip left), -1 NEG (flip right)
+    position: bool  # relay position the pulse was meant to reach
+    outcome: str  # ok | failed | not_fired
+    prepared: bool  # amp shutoff and unblocking ran for this switch
+    amplitude: float  # volts; nan when no function generator drives the pulse
+    t_prepare: float  # wall-clock time the switch started
+    t_pulse: float  # time the pulse completed; 0 if it never fired
+    t_finish: float  # time the switch, including the restore, finished
+
+    def pack_into(self, buffer, offset: int):
+        RECORD.pack_into(
+            buffer,
+            offset,
+            self.seq,
+            COMMANDS.index(self.command) if self.command in COMMANDS else 0,
+            -1 if self.channel is None else self.channel,
+            self.relay,
+            self.polarity,
+            self.position,
+            OUTCOMES.index(self.outcome),
+            self.prepared,
+            self.amplitude,
+            self.t_prepare,
+            self.t_pulse,
+            self.t_finish,
+        )
+
+    @classmethod
+    def unpack(cls, fields: tuple) -> "JournalRecord":
+        seq, command, channel, relay, polarity, position, outcome, prepared, *rest = fields
+        return cls(
+            seq,
+            COMMANDS[command] if command < len(COMMANDS) else "unknown",
+            None if channel < 0 else channel,
+            relay,
+            polarity,
+            bool(position),
+            OUTCOMES[outcome] if outcome < len(OUTCOMES) else "failed",
+            bool(prepared),
+            *rest,
+        )
+
+
+def _segments(directory: Path) -> list[Path]:
+    return sorted(directory.glob("journal-*.swj"))
+
+
+class SwitchJournal:
+    """Thread-safe writer; append() never blocks on I/O except when rotating."""
+
+    def __init__(
+        self,
+        directory: str | os.PathLike = JOURNAL_DIR,
+        segment_bytes: int = SEGMENT_BYTES,
+        max_segments: int = MAX_SEGMENTS,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # whole records only, after the header
+        self.segment_bytes = HEADER.size + max(
+            1, (segment_bytes - HEADER.size) // RECORD.size
+        ) * RECORD.size
+        self.max_segments = max(1, max_segments)
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: mmap.mmap | None = None
+        self._offset = 0
+        self._seq = 0
+        self._index = 0
+        self._resume()
+
+    def append(self, records: Iterable[JournalRecord]):
+        """Write ``records``, numbering them; their own ``seq`` is ignored."""
+        with self._lock:
+            for record in records:
+                if self._map is None:
+                    return
+                if self._offset + RECORD.size > len(self._map):
+                    self._rotate()
+                self._seq += 1
+                record._replace(seq=self._seq).pack_into(self._map, self._offset)
+                self._offset += RECORD.size
+
+    def flush(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+    def _resume(self):
+        """Continue the newest segment, after its last record, if it is ours."""
+        segments = _segments(self.directory)
+        self._seq = self._last_seq(segments)
+        if segments:
+            last = segments[-1]
+            self._index = int(last.stem.split("-")[1])
+            if _header_ok(last) and last.stat().st_size == self.segment_bytes:
+                count = sum(1 for _ in _read_segment(last))
+                self._open_segment(last, HEADER.size + count * RECORD.size)
+                return
+        self._new_segment()
+
+    @staticmethod
+    def _last_seq(segments: list[Path]) -> int:
+        for segment in reversed(segments):
+            last = None
+            for last in _read_segment(segment):
+                pass
+            if last is not None:
+                return last.seq
+        return 0
+
+    def _open_segment(self, path: Path, offset: int):
+        self._file = path.open("r+b")
+        self._map = mmap.mmap(self._file.fileno(), self.segment_bytes)
+        self._offset = offset
+
+    def _new_segment(self):
+        self._index += 1
+        path = self.directory / f"journal-{self._index:06d}.swj"
+        with path.open("wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+            file.truncate(self.segment_bytes)
+        self._open_segment(path, HEADER.size)
+        for old in _segments(self.directory)[: -self.max_segments]:
+            old.unlink(missing_ok=True)
+
+    def _rotate(self):
+        self._close_segment()
+        self._new_segment()
+
+    def _close_segment(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _header_ok(path: Path) -> bool:
+    with path.open("rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return False
+    magic, _, record_size, _ = HEADER.unpack(header)
+    return magic == MAGIC and record_size == RECORD.size
+
+
+def _read_segment(path: Path, chunk_records: int = 1024) -> Iterator[JournalRecord]:
+    if not _header_ok(path):
+        return
+    with path.open("rb") as file:
+        file.seek(HEADER.size)
+        while chunk := file.read(RECORD.size * chunk_records):
+            usable = len(chunk) - len(chunk) % RECORD.size
+            for fields in RECORD.iter_unpack(chunk[:usable]):
+                if fields[0] == 0:  # preallocated space: end of the records
+                    return
+                yield JournalRecord.unpack(fields)
+
+
+def read_journal(directory: str | os.PathLike = JOURNAL_DIR) -> Iterator[JournalRecord]:
+    """Every record in ``directory``, oldest first, one segment chunk at a time."""
+    for segment in _segments(Path(directory)):
+        yield from _read_segment(segment)
+
+
+def summarize(records: Iterable[JournalRecord]) -> dict:
+    """Actuation counts per relay and outcome, and pulse latency after prepare."""
+    fired: Counter[int] = Counter()
+    outcomes: Counter[str] = Counter()
+    latencies = []
+    for record in records:
+        outcomes[record.outcome] += 1
+        if record.outcome == "ok":
+            fired[record.relay] += 1
+            latencies.append(record.t_pulse - record.t_prepare)
+    summary = {
+        "actuations": {f"R{relay}": count for relay, count in sorted(fired.items())},
+        "outcomes": dict(outcomes),
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        summary["pulse_latency"] = {
+            "p50": cuts[49],
+            "p95": cuts[94],
+            "max": max(latencies),
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", nargs="?", default=JOURNAL_DIR)
+    parser.add_argument("--summary", action="store_true", help="counts and latency only")
+    args = parser.parse_args()
+    if args.summary:
+        print(summarize(read_journal(args.directory)))
+    else:
+        for record in read_journal(args.directory):
+            print(record)
@@ -0,0 +1,110 @@
+"""
+Switch planning for the cryogenic relay tree.
+
+The planner compares the current relay positions with the end state a command
+asks for and returns an ordered SwitchPlan listing only the pulses that have to
+fire. Nothing in this module touches hardware: CryoRelayManager.execute_plan
+runs a plan, and the ``plan_channel`` command reports one as a dry run.
+"""
+
+from models import PlannedPulse, SwitchPlan
+
+
+# The fixed relay topology is represented below as ``(left, right)`` children:
+#
+#           ___  R1 ____
+#         /              \
+#       R2                R3
+#    /      \          /      \
+#   R4       R5       R6       R7
+#  /  \     /  \     /  \     /  \
+# 7    6   5    4   3    2   1    0   relay-board channel
+# 8    7   6    5   4    3   2    1   user-facing channel
+#
+# Each relay's position lives in the reactive AppState. ``pos=True`` follows
+# the left child and ``pos=False`` follows the right child. Traversal begins at
+# R1 and ends at an integer leaf; that leaf becomes ``activated_channel``.
+TREE_CHILDREN: dict[str, tuple[str | int, str | int]] = {
+    "R1": ("R2", "R3"),
+    "R2": ("R4", "R5"),
+    "R3": ("R6", "R7"),
+    "R4": (7, 6),
+    "R5": (5, 4),
+    "R6": (3, 2),
+    "R7": (1, 0),
+}
+
+
+def planned_pulse(relay: str, position: bool) -> PlannedPulse:
+    """The pulse that leaves ``relay`` at ``position``.
+
+    ``pos=True`` is reached with flip_right and ``pos=False`` with flip_left.
+    """
+    return PlannedPulse(
+        relay=relay,
+        index=int(relay[1:]),
+        position=position,
+        flip="right" if position else "left",
+    )
+
+
+def active_path(positions: dict[str, bool]) -> tuple[list[str], int]:
+    current: str | int = "R1"
+    path: list[str] = []
+    while isinstance(current, str):
+        path.append(current)
+        left, right = TREE_CHILDREN[current]
+        current = left if positions[current] else right
+    return path, current
+
+
+def channel_plan(
+    positions: dict[str, bool],
+    number: int,
+    skip_unchanged: bool,
+    gap: float = 0.0,
+) -> SwitchPlan:
+    """Plan the pulses that route the tree to ``number`` (0-7).
+
+    With ``skip_unchanged`` (tree memory mode) relays already in position are
+    left alone; otherwise every relay on the path is re-asserted.
+    """
+    binary = bin(7 - number)[2:].zfill(3)
+    plan = SwitchPlan(command="request_channel", target_channel=number, gap=gap)
+    current: str | int = "R1"
+    for bit in binary:
+        if not isinstance(current, str):
+            raise RuntimeError("relay path ended before the requested channel")
+        desired_position = bit == "0"
+        if positions[current] == desired_position and skip_unchanged:
+            plan.skipped.append(current)
+        else:
+            plan.pulses.append(planned_pulse(current, desired_position))
+        left, right = TREE_CHILDREN[current]
+        current = left if desired_position else right
+    return plan
+
+
+def toggle_plan(positions: dict[str, bool], number: int) -> SwitchPlan:
+    relay = f"R{number}"
+    return SwitchPlan(
+        command="toggle_switch",
+        pulses=[planned_pulse(relay, not positions[relay])],
+    )
+
+
+def reset_plan() -> SwitchPlan:
+    return SwitchPlan(
+        command="reset_tree",
+        target_channel=0,
+        pulses=[planned_pulse(relay, False) for relay in TREE_CHILDREN],
+    )
+
+
+def re_assert_plan(positions: dict[str, bool]) -> SwitchPlan:
+    path, channel = active_path(positions)
+    return SwitchPlan(
+        command="re_assert_tree",
+        target_channel=channel,
+        pulses=[planned_pulse(relay, positions[relay]) for relay in path],
+    )
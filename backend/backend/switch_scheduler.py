@@ -0,0 +1,52 @@
+"""
+Latest-wins scheduling of channel requests.
+
+Clicking channel 3, then 5, then 7 in quick succession only needs the
+hardware to end up on 7. A LatestWins gate lets one request run at a time
+and keeps at most one waiting behind it. A newer request takes the waiting
+slot, and the request it displaces is told at once that it was superseded.
+The displaced request never fires a pulse. A request that is already
+switching is never interrupted; the waiting one runs after it, planned
+against the positions it left.
+
+Each request still runs in its own task, so its state patches carry its own
+command context. The gate only orders channel requests among themselves.
+Other commands, and preemptive_amp_shutoff in particular, go straight to
+the hardware lock and never wait behind queued channel requests.
+"""
+
+import asyncio
+
+
+class LatestWins:
+    def __init__(self):
+        self._busy = False
+        self._waiting: asyncio.Future[bool] | None = None
+
+    async def turn(self) -> bool:
+        """Wait for this request's turn; False if a newer request superseded it.
+
+        After True the caller must call done() when it has finished.
+        """
+        if self._waiting is not None and not self._waiting.done():
+            self._waiting.set_result(False)
+        if not self._busy:
+            self._busy = True
+            return True
+        waiting = asyncio.get_running_loop().create_future()
+        self._waiting = waiting
+        try:
+            return await waiting
+        except asyncio.CancelledError:
+            # handed the turn just before being cancelled: pass it on
+            if waiting.done() and not waiting.cancelled() and waiting.result():
+                self.done()
+            raise
+
+    def done(self):
+        """Hand the turn to the waiting request, if there is one."""
+        waiting, self._waiting = self._waiting, None
+        if waiting is not None and not waiting.done():
+            waiting.set_result(True)
+        else:
+            self._busy = False
@@ -1,8 +1,9 @@
 import time
+from shadow_registers import ShadowRegisters
 from visaInst import visaInst
 
 
-class teledyneT3AFG200(visaInst):
+class teledyneT3AFG200(ShadowRegisters, visaInst):
     """
     Class for Teledyne T3AFG200 AWG.
 
@@ -31,6 +32,9 @@ class teledyneT3AFG200(visaInst):
         equivalent; this is a no-op.
       - Default socket port is 5025 on both instruments (see programming
         guide section 1.2.4). Telnet uses 5024 — do not use that here.
+
+    As on the Keysight, amplitude, offset, polarity, burst state and trigger
+    source are cached (see ShadowRegisters) and only written when they change.
     """
 
     # Translation table from Keysight short-form function names to T3AFG WVTP.
@@ -71,6 +75,10 @@ class teledyneT3AFG200(visaInst):
         super().__init__(ipAddress, **kwargs)
 
         self.high_level = 0
+        # Wait around the trigger in trigger_with_polarity. With completion
+        # "opc" an *OPC? query replaces the fixed trigger_settle sleep.
+        self.trigger_settle = 0.5
+        self.completion = "sleep"
 
     @staticmethod
     def _edge_time_to_seconds(edge_time) -> float:
@@ -129,8 +137,12 @@ class teledyneT3AFG200(visaInst):
         :param channel: Channel number (1 or 2)
         :param amplitude: Amplitude in Vpp
         """
+        if self._holds(channel, "amplitude", amplitude):
+            return
+        self._forget(channel, "amplitude")
         self.write(f"C{channel}:BSWV AMP,{amplitude}")
         self.write("*OPC")
+        self._remember(channel, "amplitude", amplitude)
 
     def set_offset(self, channel: int, offset: float):
         """
@@ -138,16 +150,22 @@ class teledyneT3AFG200(visaInst):
         :param channel: Channel number (1 or 2)
         :param offset: Offset in Volts
         """
+        if self._holds(channel, "offset", offset):
+            return
+        self._forget(channel, "offset")
         self.write(f"C{channel}:BSWV OFST,{offset}")
         self.write("*OPC")
+        self._remember(channel, "offset", offset)
 
     def set_high_level(self, channel: int, high: float):
         """Set the high voltage level (V)."""
+        self._forget(channel, "amplitude", "offset")
         self.write(f"C{channel}:BSWV HLEV,{high}")
         self.write("*OPC")
 
     def set_low_level(self, channel: int, low: float):
         """Set the low voltage level (V)."""
+        self._forget(channel, "amplitude", "offset")
         self.write(f"C{channel}:BSWV LLEV,{low}")
         self.write("*OPC")
 
@@ -170,6 +188,7 @@ class teledyneT3AFG200(visaInst):
         Configure a pulse waveform with specified parameters.
         Keysight had a single APPLy:PULSe command; T3AFG needs separate BSWV writes.
         """
+        self._forget(channel, "amplitude", "offset")
         self.write(f"C{channel}:BSWV WVTP,PULSE")
         self.write(f"C{channel}:BSWV FRQ,{freq}")
         self.write(f"C{channel}:BSWV AMP,{amplitude}")
@@ -207,13 +226,17 @@ class teledyneT3AFG200(visaInst):
         :param channel: Channel number (1 or 2)
         :param polarity: 'POS' or 'NEG'
         """
+        if polarity not in ("POS", "NEG"):
+            raise ValueError("Polarity must be 'POS' or 'NEG'")
+        if self._holds(channel, "polarity", polarity):
+            return
+        self._forget(channel, "polarity")
         if polarity == "POS":
             self.write(f"C{channel}:OUTP PLRT,NOR")
-        elif polarity == "NEG":
-            self.write(f"C{channel}:OUTP PLRT,INVT")
         else:
-            raise ValueError("Polarity must be 'POS' or 'NEG'")
+            self.write(f"C{channel}:OUTP PLRT,INVT")
         self.write("*OPC")
+        self._remember(channel, "polarity", polarity)
 
     def phase_sync(self):
         """
@@ -230,11 +253,69 @@ class teledyneT3AFG200(visaInst):
 
     def trigger_with_polarity(self, channel: int, high_level: float, polarity: str):
         self.set_pulse_polarity(channel, polarity, high_level)
-        time.sleep(0.5)
+        self._settle()
         self.immediate_trigger(channel)
-        time.sleep(0.5)
+        self._settle()
         self.write("*OPC")
 
+    def wait_for_completion(self):
+        """Block until every command sent so far has been executed."""
+        return self.query("*OPC?")
+
+    def _settle(self):
+        if self.completion == "opc":
+            self.wait_for_completion()
+        else:
+            time.sleep(self.trigger_settle)
+
+    def _pulse_settings(self, channel: int, high_level: float, polarity: str):
+        """(setting, value, command) for each setting set_pulse_polarity would make."""
+        if polarity == "POS":
+            offset, plrt = high_level / 2, "NOR"
+        elif polarity == "NEG":
+            offset, plrt = -high_level / 2, "INVT"
+        else:
+            raise ValueError("Polarity must be 'POS' or 'NEG'")
+        return [
+            ("amplitude", high_level, f"C{channel}:BSWV AMP,{high_level}"),
+            ("offset", offset, f"C{channel}:BSWV OFST,{offset}"),
+            ("polarity", polarity, f"C{channel}:OUTP PLRT,{plrt}"),
+        ]
+
+    def pulse_program(self, channel: int, high_level: float, polarity: str) -> list[str]:
+        """
+        Commands that configure and fire one pulse: the same settings as
+        set_pulse_polarity followed by immediate_trigger (burst MTRIG).
+        Settings the instrument already holds are left out.
+        """
+        changed = [
+            command
+            for setting, value, command in self._pulse_settings(channel, high_level, polarity)
+            if not self._holds(channel, setting, value)
+        ]
+        return [*changed, f"C{channel}:BTWV MTRIG"]
+
+    def run_program(self, commands: list[str]) -> str:
+        """
+        Send commands as one semicolon-joined message. The T3AFG executes them
+        in order, so a single trailing *OPC? confirms the whole program.
+        """
+        return self.query(";".join([*commands, "*OPC?"]))
+
+    def fire_pulse(self, channel: int, high_level: float, polarity: str):
+        """Configure and trigger one pulse in a single instrument round trip."""
+        changed = [
+            (setting, value)
+            for setting, value, _ in self._pulse_settings(channel, high_level, polarity)
+            if not self._holds(channel, setting, value)
+        ]
+        program = self.pulse_program(channel, high_level, polarity)
+        self._forget(channel, *(setting for setting, _ in changed))
+        result = self.run_program(program)
+        for setting, value in changed:
+            self._remember(channel, setting, value)
+        return result
+
     # Maintaining backward compatibility with original functions
     def filter_channel(self, phase: float, freq: float):
         """Legacy compatibility function for channel 1 settings"""
@@ -304,14 +385,23 @@ class teledyneT3AFG200(visaInst):
         # Keysight had a single TRANsition:BOTH; T3AFG splits into RISE / FALL.
         self.write(f"C{channel}:BSWV RISE,{edge_s}")
         self.write(f"C{channel}:BSWV FALL,{edge_s}")
+        self._forget(channel, "amplitude", "offset")
         self.enable_burst(channel)
         self.write("*OPC")
 
     def enable_burst(self, channel: int):
+        if self._holds(channel, "burst", True):
+            return
+        self._forget(channel, "burst")
         self.write(f"C{channel}:BTWV STATE,ON")
+        self._remember(channel, "burst", True)
 
     def disable_burst(self, channel: int):
+        if self._holds(channel, "burst", False):
+            return
+        self._forget(channel, "burst")
         self.write(f"C{channel}:BTWV STATE,OFF")
+        self._remember(channel, "burst", False)
 
     def set_thermal_source_mode(self):
         self.write("C1:BSWV WVTP,SQUARE")
@@ -337,7 +427,12 @@ class teledyneT3AFG200(visaInst):
             raise ValueError("Invalid trigger source. Must be one of IMMediate, EXTernal, TIMer, BUS.")
 
         t3_src = self._TRIG_SRC_MAP[source]
-        return self.write(f"C{channel}:BTWV TRSR,{t3_src}")
+        if self._holds(channel, "trigger_source", t3_src):
+            return
+        self._forget(channel, "trigger_source")
+        result = self.write(f"C{channel}:BTWV TRSR,{t3_src}")
+        self._remember(channel, "trigger_source", t3_src)
+        return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+"""
+Helpers for the hardware timing profile (models.TimingProfile).
+"""
+
+import threading
+
+
+class SettleTracker:
+    """
+    Running estimate of how long a step really takes to settle, for the
+    adaptive timing mode.
+
+    ``suggest`` returns how long to wait before the first completion poll: a
+    fraction of the smoothed observed settle time, so polling still starts a
+    little early and keeps measuring the real value. With no observations yet
+    it returns 0 and the caller polls from the start.
+    """
+
+    def __init__(self, alpha: float = 0.3, lead: float = 0.8):
+        self.alpha = alpha
+        self.lead = lead
+        self._estimate: float | None = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            if self._estimate is None:
+                self._estimate = seconds
+            else:
+                self._estimate += self.alpha * (seconds - self._estimate)
+
+    @property
+    def estimate(self) -> float | None:
+        return self._estimate
+
+    def suggest(self, maximum: float) -> float:
+        if self._estimate is None:
+            return 0.0
+        return min(maximum, self.lead * self._estimate)
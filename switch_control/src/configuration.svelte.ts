@@ -1,4 +1,8 @@
-import type { ButtonLabelState, ConfigurationHistoryItem } from "./types";
+import type {
+  ButtonLabelState,
+  ConfigurationHistoryItem,
+  ConfigurationHistoryPage,
+} from "./types";
 import { appState, runtime } from "./sync.svelte";
 
 const defaultLabels: ButtonLabelState = {
@@ -39,11 +43,25 @@ class Configuration {
     return response.result;
   }
 
-  async history(): Promise<ConfigurationHistoryItem[]> {
-    const response = await runtime.sendCommand<ConfigurationHistoryItem[]>(
-      "list_configuration_history",
+  async historyPage(
+    cursor: string | null = null,
+    limit = 50,
+  ): Promise<ConfigurationHistoryPage> {
+    const response = await runtime.sendCommand<ConfigurationHistoryPage>(
+      "configuration_history_page",
+      { limit, cursor, summary: true },
     );
-    return response.result ?? [];
+    return response.result ?? { items: [], next_cursor: null };
+  }
+
+  async detail(configurationId: number): Promise<ConfigurationHistoryItem> {
+    const response = await runtime.sendCommand<ConfigurationHistoryItem>(
+      "get_configuration",
+      { configuration_id: configurationId },
+    );
+    if (!response.result)
+      throw new Error("That saved configuration no longer exists.");
+    return response.result;
   }
 
   async load(configurationId: number): Promise<void> {
@@ -40,13 +40,21 @@ export interface ButtonLabelState {
   label_7: string;
 }
 
-export interface ConfigurationHistoryItem {
+export interface ConfigurationSummary {
   id: number;
   title_label: string;
   created_at: string;
+}
+
+export interface ConfigurationHistoryItem extends ConfigurationSummary {
   labels: ButtonLabelState;
 }
 
+export interface ConfigurationHistoryPage {
+  items: ConfigurationSummary[];
+  next_cursor: string | null;
+}
+
 export interface ButtonState {
   name: string;
   proxy_name: string;
@@ -75,6 +83,43 @@ export interface PulseGeneratorInfo {
   message: string | null;
 }
 
+export type DeviceReadiness =
+  "pending" | "ready" | "missing" | "error" | "timeout";
+
+export interface DeviceStatus {
+  status: DeviceReadiness;
+  message: string | null;
+  seconds: number | null;
+}
+
+export interface HardwareState {
+  relay_board: DeviceStatus;
+  pulse_generator: DeviceStatus;
+  power_supply: DeviceStatus;
+}
+
+// Lifetime actuation counts (backend relay_wear.py)
+export interface RelayWear {
+  pulses: Record<string, number>; // "R1".."R7" -> pulses fired
+  skipped: Record<string, number>; // pulses tree memory mode did not need
+  routing: Record<string, number>; // Numato relay "0".."7" -> on/off transitions
+}
+
+// Latency summary per name, in milliseconds (backend metrics.py)
+export interface LatencySummary {
+  count: number;
+  mean_ms: number;
+  p50_ms: number;
+  p95_ms: number;
+  max_ms: number;
+  last_ms: number;
+}
+
+export interface Metrics {
+  phases: Record<string, LatencySummary>; // amp_off, unblock, wire_switch, ...
+  commands: Record<string, LatencySummary>; // request_channel, toggle_switch, ...
+}
+
 export type InviteStatus =
   "idle" | "active" | "consumed" | "expired" | "revoked";
 
@@ -89,5 +134,8 @@ export interface AppState {
   button_labels: ButtonLabelState;
   settings: Settings;
   pulse_generator: PulseGeneratorInfo;
+  hardware: HardwareState;
+  relay_wear: RelayWear;
+  metrics: Metrics;
   remote_access: RemoteAccessState;
 }